@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def inline_background_work(settings):
+    """Миниатюры и граф подписок — сразу, в потоке теста.
+
+    Фоновый поток пережил бы временный MEDIA_ROOT и тестовую транзакцию.
+    """
+    settings.THUMBNAIL_WORKERS = 0
+    settings.FOLLOW_GRAPH_BACKGROUND = False
@@ -0,0 +1,97 @@
+"""Кэш с инвалидацией по тегам.
+
+У каждого тега ('feed:index', 'group:<id>', 'author:<id>', 'post:<id>')
+в кэше хранится версия. Ключ закэшированного значения включает версии
+всех его тегов, поэтому bump(tag) разом делает устаревшими все значения
+с этим тегом, не перебирая их: старые ключи просто больше не читаются и
+вытесняются по TTL. Поэтому кэш должен быть общим для всех процессов
+(memcached вне DEBUG, см. CACHES): иначе bump() сбросит значения только
+в том воркере, который обработал изменение.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+
+def _new_version():
+    # Время, а не счётчик: после вытеснения версии из кэша новая
+    # не совпадёт ни с одной из прежних.
+    return str(time.time_ns())
+
+
+def tag_versions(tags):
+    """Версии каждого из тегов — одно обращение к кэшу."""
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def tag_version(*tags):
+    """Общая версия набора тегов."""
+    return '.'.join(tag_versions(tags))
+
+
+def bump(*tags):
+    """Делает устаревшими все значения, помеченные любым из тегов."""
+    if tags:
+        cache.set_many({_tag_key(tag): _new_version() for tag in tags}, None)
+
+
+def get_or_set(name, tags, producer, timeout):
+    """Значение name, закэшированное до смены версии любого из тегов."""
+    key = f'tagged:{name}:{tag_version(*tags)}'
+    value = cache.get(key)
+    if value is None:
+        value = producer()
+        cache.set(key, value, timeout)
+    return value
+
+
+def tagged_condition(tags_func):
+    """Условный GET для view, чей ответ зависит только от версий тегов.
+
+    tags_func(request, *args, **kwargs) возвращает теги страницы. ETag
+    строится из их версий, пользователя, CSRF-cookie и строки запроса,
+    поэтому ответ 304 отдаётся без рендеринга, а страница с формой после
+    нового входа не остаётся со старым токеном. Last-Modified — время
+    последнего bump тегов; он отдаётся только анонимам: страницы
+    пользователей различаются, а If-Modified-Since не знает, кому
+    принадлежала закэшированная копия.
+    """
+    def validators(request, *args, **kwargs):
+        if not hasattr(request, '_tag_validators'):
+            versions = tag_versions(tags_func(request, *args, **kwargs))
+            user = request.user
+            parts = versions + [
+                f'user:{user.pk}' if user.is_authenticated else 'anonymous',
+                # В формах страницы — CSRF-токен, а вход его меняет.
+                request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+                request.GET.urlencode(),
+            ]
+            etag = hashlib.md5('|'.join(parts).encode()).hexdigest()
+            last_modified = None
+            if not user.is_authenticated:
+                last_modified = datetime.fromtimestamp(
+                    max(map(int, versions)) / 1e9, timezone.utc
+                )
+            request._tag_validators = etag, last_modified
+        return request._tag_validators
+
+    return condition(
+        etag_func=lambda *args, **kwargs: validators(*args, **kwargs)[0],
+        last_modified_func=lambda *args, **kwargs: validators(
+            *args, **kwargs
+        )[1],
+    )
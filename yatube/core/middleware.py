@@ -0,0 +1,91 @@
+import logging
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+class QueryBudgetExceeded(Exception):
+    """View сделал больше запросов к БД, чем ему разрешено."""
+
+
+def fingerprint(sql):
+    """Форма запроса без значений: списки IN любой длины совпадают."""
+    return IN_LIST.sub('(...)', sql)
+
+
+class QueryRecorder:
+    """Считает запросы, их общее время и повторы одной формы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.monotonic() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self, limit):
+        """Формы запросов, выполненные больше limit раз — признак N+1."""
+        return {
+            sql: count for sql, count in self.fingerprints.items()
+            if count > limit
+        }
+
+
+class QueryBudgetMiddleware:
+    """Следит за числом запросов к БД на каждый view.
+
+    Лимит берётся из QUERY_BUDGET_VIEWS по имени view, иначе
+    QUERY_BUDGET_DEFAULT. Превышение лимита и повторы одной формы
+    запроса сверх QUERY_REPEAT_LIMIT пишутся в лог; при
+    QUERY_BUDGET_ACTION = 'raise' превышение лимита — ошибка.
+    В режиме DEBUG счётчики добавляются в заголовки ответа.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        self.check(request, recorder)
+        if settings.DEBUG:
+            response['X-Query-Count'] = recorder.count
+            response['X-Query-Time'] = f'{recorder.duration * 1000:.1f}ms'
+        return response
+
+    def check(self, request, recorder):
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        budget = settings.QUERY_BUDGET_VIEWS.get(
+            view_name, settings.QUERY_BUDGET_DEFAULT
+        )
+        for sql, count in recorder.repeated(
+            settings.QUERY_REPEAT_LIMIT
+        ).items():
+            logger.warning(
+                '%s: запрос выполнен %d раз: %s', view_name, count, sql
+            )
+        if recorder.count <= budget:
+            return
+        message = (
+            f'{view_name}: {recorder.count} запросов '
+            f'({recorder.duration * 1000:.1f} мс) при лимите {budget}'
+        )
+        if settings.QUERY_BUDGET_ACTION == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,11 @@
+from django import template
+
+from core import cache
+
+register = template.Library()
+
+
+@register.simple_tag
+def tag_version(tag, *parts):
+    """Версия тега для ключа {% cache %}: tag_version 'group' group.pk."""
+    return cache.tag_version(':'.join([tag, *map(str, parts)]))
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import cache as tagged_cache
+from core.middleware import QueryBudgetExceeded, QueryRecorder
+
+User = get_user_model()
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+
+    def test_recorder_finds_repeated_queries(self):
+        users = [
+            User.objects.create_user(username=f'user{i}') for i in range(4)
+        ]
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for user in users:
+                User.objects.get(pk=user.pk)
+            User.objects.filter(pk__in=[user.pk for user in users]).count()
+            User.objects.filter(pk__in=[users[0].pk]).count()
+        self.assertEqual(recorder.count, 6)
+        self.assertEqual(list(recorder.repeated(3).values()), [4])
+        self.assertEqual(list(recorder.repeated(1).values()), [4, 2])
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        response = self.client.get(reverse('posts:homepage'))
+        self.assertIn('X-Query-Count', response)
+        self.assertTrue(response['X-Query-Time'].endswith('ms'))
+
+    def test_budget_overrun_is_logged(self):
+        with self.settings(QUERY_BUDGET_VIEWS={'posts:homepage': 0}):
+            with self.assertLogs('core.middleware', 'WARNING') as logs:
+                self.client.get(reverse('posts:homepage'))
+        self.assertIn('posts:homepage', logs.output[0])
+
+    @override_settings(
+        QUERY_BUDGET_VIEWS={'posts:homepage': 0},
+        QUERY_BUDGET_ACTION='raise',
+    )
+    def test_budget_overrun_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:homepage'))
+
+
+class TaggedCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_invalidates_only_tagged_values(self):
+        calls = []
+
+        def producer(name):
+            def produce():
+                calls.append(name)
+                return name
+            return produce
+
+        for _ in range(2):
+            tagged_cache.get_or_set('a', ['x'], producer('a'), 60)
+            tagged_cache.get_or_set('b', ['x', 'y'], producer('b'), 60)
+            tagged_cache.get_or_set('c', ['z'], producer('c'), 60)
+        self.assertEqual(calls, ['a', 'b', 'c'])
+        tagged_cache.bump('y')
+        for name, tags in (('a', ['x']), ('b', ['x', 'y']), ('c', ['z'])):
+            tagged_cache.get_or_set(name, tags, producer(name), 60)
+        self.assertEqual(calls, ['a', 'b', 'c', 'b'])
+
+    def test_version_survives_until_bump(self):
+        version = tagged_cache.tag_version('feed:index')
+        self.assertEqual(tagged_cache.tag_version('feed:index'), version)
+        tagged_cache.bump('feed:index')
+        self.assertNotEqual(tagged_cache.tag_version('feed:index'), version)
@@ -1,4 +1,12 @@
 from django.shortcuts import render
+from django.views.static import serve
+
+# Имена файлов в MEDIA_ROOT не переиспользуются: картинки постов названы
+# по содержимому, миниатюры — по оригиналу и параметрам нарезки.
+# view media отдаёт их только при DEBUG; в продакшене MEDIA_URL отдаёт
+# веб-сервер, и тот же заголовок нужно выставить в его настройках:
+# Cache-Control: public, max-age=31536000, immutable.
+MEDIA_MAX_AGE = 60 * 60 * 24 * 365
 
 
 def page_not_found(request, exception):
@@ -15,3 +23,10 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+def media(request, path, document_root=None):
+    """Отдаёт медиафайл с заголовками для вечного кэширования."""
+    response = serve(request, path, document_root=document_root)
+    response['Cache-Control'] = f'public, max-age={MEDIA_MAX_AGE}, immutable'
+    return response
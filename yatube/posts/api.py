@@ -0,0 +1,117 @@
+"""Read-only JSON API лент постов.
+
+Те же выборки, что у index, group_posts и profile, но без шаблонов:
+строки берутся через values() с нужными полями (?fields=), страницы —
+по курсору, а тело ответа отдаётся потоком.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
+from .models import Group, Post, User
+from .utils import SHOW_POSTS, InvalidCursor, KeysetPaginator
+
+MAX_LIMIT = 100
+
+# Поле ответа -> выражение для values().
+FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+}
+KEYS = ('pub_date', 'id')
+
+
+class BadRequest(Exception):
+    pass
+
+
+def parse_fields(request):
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(FIELDS)
+    fields = [field for field in raw.split(',') if field]
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return fields
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', SHOW_POSTS))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def serialize(row, fields):
+    item = {field: row[FIELDS[field]] for field in fields}
+    if item.get('image'):
+        item['image'] = Post._meta.get_field('image').storage.url(
+            item['image']
+        )
+    return item
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def stream_page(request, posts):
+    """Страница ленты в JSON, отдаваемая по мере сериализации строк."""
+    try:
+        fields = parse_fields(request)
+        limit = parse_limit(request)
+        columns = {FIELDS[field] for field in fields} | set(KEYS)
+        rows = posts.order_by().values(*columns)
+        try:
+            page = KeysetPaginator(rows, limit, keys=KEYS).page(
+                request.GET.get('cursor')
+            )
+        except InvalidCursor:
+            raise BadRequest('Неверный cursor')
+    except BadRequest as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    def body():
+        yield '{"results": ['
+        for position, row in enumerate(page):
+            if position:
+                yield ', '
+            yield json.dumps(
+                serialize(row, fields), cls=DjangoJSONEncoder,
+                ensure_ascii=False,
+            )
+        yield '], "next": ' + json.dumps(page_url(request, page.next_cursor))
+        yield ', "previous": ' + json.dumps(
+            page_url(request, page.previous_cursor)
+        ) + '}'
+
+    return StreamingHttpResponse(
+        body(), content_type='application/json; charset=utf-8'
+    )
+
+
+def index(request):
+    return stream_page(request, Post.objects.all())
+
+
+def group_posts(request, group_slug):
+    group = get_object_or_404(Group, slug=group_slug)
+    return stream_page(request, Post.objects.filter(group=group))
+
+
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return stream_page(request, Post.objects.filter(author=author))
@@ -0,0 +1,130 @@
+"""RSS и Atom ленты: общая, групп и авторов.
+
+Лента строится по последним FEED_ITEMS постам и кэшируется до смены
+версии тега своей ленты, а на повторный опрос с тем же ETag отвечает
+304, поэтому частый опрос читалками почти ничего не стоит.
+"""
+from django.contrib.syndication.views import Feed
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from core.cache import get_or_set, tagged_condition
+from .models import Group, Post, User
+from .utils import author_tags, group_tags
+
+FEED_ITEMS = 20
+FEED_TIMEOUT = 60 * 60 * 24
+
+
+class LatestPostsFeed(Feed):
+    title = 'Yatube: новые записи'
+    description = 'Последние записи всех авторов'
+
+    def link(self):
+        return reverse('posts:homepage')
+
+    def posts(self, obj):
+        return Post.objects.select_related('author', 'group')
+
+    def items(self, obj):
+        return self.posts(obj)[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return f'{item.author.username}: {item.text[:50]}'
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.pk})
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+
+class GroupPostsFeed(LatestPostsFeed):
+
+    def get_object(self, request, group_slug):
+        return get_object_or_404(Group, slug=group_slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', kwargs={'group_slug': obj.slug})
+
+    def posts(self, obj):
+        return super().posts(obj).filter(group=obj)
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: записи {obj.username}'
+
+    def description(self, obj):
+        return f'Последние записи пользователя {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', kwargs={'username': obj.username})
+
+    def posts(self, obj):
+        return super().posts(obj).filter(author=obj)
+
+
+def atom(feed_class):
+    """Тот же фид в формате Atom."""
+    return type(
+        f'{feed_class.__name__}Atom',
+        (feed_class,),
+        {'feed_type': Atom1Feed, 'subtitle': feed_class.description},
+    )
+
+
+def index_tags(request):
+    return ['feed:index']
+
+
+def cached_feed(feed_class, tags_func):
+    """View фида, закэшированного до смены версии тегов его ленты."""
+    feed = feed_class()
+
+    def tags(request, *args, **kwargs):
+        # Теги нужны и для ETag, и для ключа кэша: считаем их один раз.
+        if not hasattr(request, '_feed_tags'):
+            request._feed_tags = tags_func(request, *args, **kwargs)
+        return request._feed_tags
+
+    @tagged_condition(tags)
+    def view(request, *args, **kwargs):
+        def render():
+            response = feed(request, *args, **kwargs)
+            return response.content, response['Content-Type']
+
+        content, content_type = get_or_set(
+            f'syndication:{request.path}',
+            tags(request, *args, **kwargs),
+            render,
+            FEED_TIMEOUT,
+        )
+        return HttpResponse(content, content_type=content_type)
+    return view
+
+
+index_rss = cached_feed(LatestPostsFeed, index_tags)
+index_atom = cached_feed(atom(LatestPostsFeed), index_tags)
+group_rss = cached_feed(GroupPostsFeed, group_tags)
+group_atom = cached_feed(atom(GroupPostsFeed), group_tags)
+author_rss = cached_feed(AuthorPostsFeed, author_tags)
+author_atom = cached_feed(atom(AuthorPostsFeed), author_tags)
@@ -0,0 +1,46 @@
+"""Кэш подписок пользователя: на кого он подписан.
+
+Множество id авторов читается из Follow один раз и хранится в кэше под
+тегом 'follow:<user_id>'. Подписка и отписка сдвигают версию тега в
+сигналах Follow, а после коммита — ещё раз, чтобы запрос, успевший
+перечитать таблицу до коммита, не оставил в кэше старое множество.
+Вопросы «подписан ли A на B» и «на кого подписан A» после этого
+решаются поиском в множестве, без запросов к БД.
+"""
+from django.db import transaction
+
+from core.cache import bump, get_or_set
+from .models import Follow
+
+FOLLOWS_TIMEOUT = 60 * 60 * 24
+
+
+def _tag(user_id):
+    return f'follow:{user_id}'
+
+
+def following_ids(user_id):
+    """frozenset id авторов, на которых подписан пользователь."""
+    if user_id is None:
+        return frozenset()
+    return get_or_set(
+        f'follows:{user_id}',
+        [_tag(user_id)],
+        lambda: frozenset(
+            Follow.objects.filter(user_id=user_id).values_list(
+                'author_id', flat=True
+            )
+        ),
+        FOLLOWS_TIMEOUT,
+    )
+
+
+def is_following(user, author):
+    """Подписан ли пользователь (возможно, анонимный) на автора."""
+    return user.is_authenticated and author.pk in following_ids(user.pk)
+
+
+def changed(user_id):
+    """Сбрасывает подписки пользователя сейчас и после коммита."""
+    bump(_tag(user_id))
+    transaction.on_commit(lambda: bump(_tag(user_id)))
@@ -1,4 +1,7 @@
 from django import forms
+from PIL import Image, UnidentifiedImageError
+
+from . import images
 from .models import Comment, Post
 
 
@@ -13,6 +16,28 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not image or 'image' not in self.changed_data:
+            return image
+        try:
+            return images.normalize(image)
+        except images.ImageTooLarge as error:
+            raise forms.ValidationError(
+                f'Слишком большая картинка: {error}.', code='too_large'
+            )
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            raise forms.ValidationError(
+                'Не удалось прочитать картинку.', code='invalid_image'
+            )
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        # Миниатюра режется в фоне, а не при первом показе поста.
+        if commit and 'image' in self.changed_data:
+            images.schedule(post)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     help_texts = {
@@ -0,0 +1,242 @@
+"""Уменьшенные копии картинок постов, которые готовятся в фоне.
+
+Сохранение поста с новой картинкой ставит в очередь пула потоков задачу
+на нарезку копий нескольких ширин в JPEG и WebP, после коммита
+транзакции. Нарезанные копии записываются в ImageVariant; шаблоны
+берут их только оттуда и, пока записей нет, показывают заглушку,
+поэтому запрос страницы никогда не декодирует оригинал. Готовые копии
+сбрасывают кэш карточки и лент поста.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+from sorl.thumbnail import default
+
+from core.cache import bump
+from .models import ImageVariant
+from .utils import post_scopes
+
+logger = logging.getLogger(__name__)
+
+# Пропорции кадра карточки поста: 960x339.
+ASPECT = 339 / 960
+VARIANT_OPTIONS = {'crop': 'center', 'upscale': True}
+
+CHUNK_SIZE = 64 * 1024
+# Через сколько секунд снова пробовать картинку, которую не удалось нарезать.
+RETRY_AFTER = 60 * 60
+
+_executor = None
+_pending = set()
+# Имя оригинала -> time.monotonic(), раньше которого нарезку не повторять.
+_failed = {}
+_lock = threading.Lock()
+
+
+class ImageTooLarge(Exception):
+    """Размеры картинки из заголовка больше допустимых."""
+
+
+def _spool(upload):
+    """Оригинал загрузки как файл на диске.
+
+    Большая загрузка уже лежит во временном файле, и он открывается
+    заново; маленькая копируется во временный файл кусками.
+    """
+    if hasattr(upload, 'temporary_file_path'):
+        return open(upload.temporary_file_path(), 'rb')
+    spooled = tempfile.TemporaryFile()
+    upload.seek(0)
+    for chunk in upload.chunks(CHUNK_SIZE):
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+def normalize(upload):
+    """Приводит загруженную картинку к прогрессивному JPEG.
+
+    Размеры проверяются по заголовку, до декодирования. Оригинал
+    читается с диска, JPEG сразу декодируется в уменьшенном масштабе
+    (draft), картинка ужимается до IMAGE_MAX_SIDE по большей стороне,
+    поворачивается по EXIF и сохраняется без метаданных. Уменьшать при
+    декодировании умеет только JPEG: другие форматы декодируются целиком,
+    поэтому для них предел строже — IMAGE_MAX_DECODED_PIXELS.
+    """
+    with _spool(upload) as source:
+        image = Image.open(source)
+        width, height = image.size
+        limit = settings.IMAGE_MAX_PIXELS
+        if image.format != 'JPEG':
+            limit = min(limit, settings.IMAGE_MAX_DECODED_PIXELS)
+        if width * height > limit:
+            raise ImageTooLarge(f'{width}x{height}')
+        side = settings.IMAGE_MAX_SIDE
+        image.draft('RGB', (side, side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((side, side), Image.LANCZOS)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        result = tempfile.TemporaryFile()
+        image.save(
+            result, 'JPEG', quality=settings.IMAGE_JPEG_QUALITY,
+            optimize=True, progressive=True,
+        )
+    result.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return File(result, name=f'{name}.jpg')
+
+
+def variant_formats():
+    """JPEG всегда, WebP — если Pillow собран с его поддержкой."""
+    if features.check('webp'):
+        return ('JPEG', 'WEBP')
+    return ('JPEG',)
+
+
+class Picture:
+    """Набор копий одной картинки для <picture> и srcset."""
+
+    def __init__(self, variants):
+        by_format = {}
+        for variant in sorted(variants, key=lambda v: v.width):
+            by_format.setdefault(variant.format, []).append(variant)
+        self.jpeg = by_format.get('JPEG', [])
+        self.webp = by_format.get('WEBP', [])
+        largest = self.jpeg[-1]
+        self.src = largest.url
+        self.width = largest.width
+        self.height = largest.height
+
+    @staticmethod
+    def _srcset(variants):
+        return ', '.join(f'{v.url} {v.width}w' for v in variants)
+
+    @property
+    def srcset(self):
+        return self._srcset(self.jpeg)
+
+    @property
+    def webp_srcset(self):
+        return self._srcset(self.webp)
+
+
+def pictures(names):
+    """Картинки по именам оригиналов; ещё не нарезанных нет в словаре."""
+    variants = {}
+    for variant in ImageVariant.objects.filter(source__in=set(names)):
+        variants.setdefault(variant.source, []).append(variant)
+    return {
+        name: Picture(items) for name, items in variants.items()
+        if any(item.format == 'JPEG' for item in items)
+    }
+
+
+def attach_pictures(posts):
+    """Находит копии картинок всех постов страницы одним запросом.
+
+    Результат кладётся в post.picture, и post_image его не перечитывает.
+    """
+    posts = [post for post in posts if post.image]
+    found = pictures(post.image.name for post in posts)
+    for post in posts:
+        post.picture = found.get(post.image.name)
+
+
+def generate(name, tags):
+    """Нарезает и записывает копии картинки, сбрасывает кэш страниц.
+
+    Неудача запоминается: до истечения RETRY_AFTER картинка не
+    нарезается заново при каждом показе поста.
+    """
+    try:
+        variants = []
+        for width in settings.IMAGE_VARIANT_WIDTHS:
+            geometry = f'{width}x{round(width * ASPECT)}'
+            for image_format in variant_formats():
+                thumbnail = default.backend.get_thumbnail(
+                    name, geometry, format=image_format, **VARIANT_OPTIONS
+                )
+                variants.append(ImageVariant(
+                    source=name,
+                    format=image_format,
+                    name=thumbnail.name,
+                    width=thumbnail.width,
+                    height=thumbnail.height,
+                ))
+        ImageVariant.objects.bulk_create(variants, ignore_conflicts=True)
+        bump(*tags)
+    except Exception:
+        logger.exception('Не удалось нарезать копии картинки %s', name)
+        with _lock:
+            _failed[name] = time.monotonic() + RETRY_AFTER
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def _work(name, tags):
+    try:
+        generate(name, tags)
+    finally:
+        # У каждого потока пула своё соединение с БД.
+        connection.close()
+
+
+def _submit(name, tags):
+    global _executor
+    with _lock:
+        if name in _pending or _failed.get(name, 0) > time.monotonic():
+            return
+        _failed.pop(name, None)
+        _pending.add(name)
+        if settings.THUMBNAIL_WORKERS and _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails'
+            )
+    if settings.THUMBNAIL_WORKERS:
+        _executor.submit(_work, name, tags)
+    else:
+        generate(name, tags)
+
+
+def _tags(post):
+    return post_scopes(post) + [f'post:{post.pk}']
+
+
+def schedule(post):
+    """Ставит нарезку копий картинки поста в очередь после коммита."""
+    if post.image:
+        name, tags = post.image.name, _tags(post)
+        transaction.on_commit(lambda: _submit(name, tags))
+
+
+def picture_or_schedule(post):
+    """Нарезанная картинка поста; если копий нет — заказывает нарезку.
+
+    Нужна для картинок, загруженных до появления фоновой нарезки.
+    """
+    if not post.image:
+        return None
+    try:
+        picture = post.picture
+    except AttributeError:
+        picture = pictures([post.image.name]).get(post.image.name)
+    if picture is None:
+        _submit(post.image.name, _tags(post))
+        if not settings.THUMBNAIL_WORKERS:
+            picture = pictures([post.image.name]).get(post.image.name)
+    return picture
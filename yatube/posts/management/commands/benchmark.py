@@ -0,0 +1,191 @@
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from core.middleware import QueryRecorder
+from posts.models import Follow, Group, Post, User
+
+ENDPOINTS = ('index', 'group_list', 'profile', 'post_detail', 'follow_index')
+SAMPLE_SIZE = 1000
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу; values отсортированы."""
+    if not values:
+        return 0.0
+    # round() убирает ошибку вида 0.07 * 100 == 7.000000000000001.
+    rank = math.ceil(round(share * len(values), 9))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает ленты через posts.urls параллельными клиентами и '
+        'выводит задержки p50/p95/p99, пропускную способность и число '
+        'запросов к БД на страницу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Запросов на каждую страницу.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Число одновременных клиентов.'
+        )
+        parser.add_argument(
+            '--logged-in', type=float, default=0.5,
+            help='Доля запросов от авторизованных пользователей.'
+        )
+        parser.add_argument(
+            '--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS,
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--json', metavar='PATH',
+            help="Записать результаты в JSON ('-' — в stdout)."
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.local = threading.local()
+        self.users = list(
+            User.objects.filter(
+                pk__in=Follow.objects.values('user')[:SAMPLE_SIZE]
+            )
+        ) or list(User.objects.all()[:SAMPLE_SIZE])
+        self.authors = list(
+            Post.objects.values_list('author__username', flat=True)
+            .distinct()[:SAMPLE_SIZE]
+        )
+        self.groups = list(
+            Group.objects.values_list('slug', flat=True)[:SAMPLE_SIZE]
+        )
+        self.posts = list(
+            Post.objects.values_list('pk', flat=True)[:SAMPLE_SIZE]
+        )
+        if not self.posts or not self.users:
+            raise CommandError(
+                'Нет данных для нагрузки: сначала выполните manage.py seed.'
+            )
+
+        results = {}
+        for endpoint in options['endpoints']:
+            if endpoint == 'group_list' and not self.groups:
+                continue
+            plan = self.plan(endpoint, options)
+            results[endpoint] = self.run(plan, options['concurrency'])
+
+        report = {
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'logged_in': options['logged_in'],
+            'seed': options['seed'],
+            'endpoints': results,
+        }
+        if options['json'] == '-':
+            # stdout целиком отдан JSON, таблица уходит в stderr.
+            self.print_table(results, self.stderr)
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.print_table(results, self.stdout)
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def plan(self, endpoint, options):
+        """Список (url, пользователь или None) для одной страницы."""
+        plan = []
+        for _ in range(options['requests']):
+            user = None
+            if (
+                endpoint == 'follow_index'
+                or self.random.random() < options['logged_in']
+            ):
+                user = self.random.choice(self.users)
+            if endpoint == 'index':
+                url = reverse('posts:homepage')
+            elif endpoint == 'group_list':
+                url = reverse('posts:group_list', kwargs={
+                    'group_slug': self.random.choice(self.groups)
+                })
+            elif endpoint == 'profile':
+                url = reverse('posts:profile', kwargs={
+                    'username': self.random.choice(self.authors)
+                })
+            elif endpoint == 'post_detail':
+                url = reverse('posts:post_detail', kwargs={
+                    'post_id': self.random.choice(self.posts)
+                })
+            else:
+                url = reverse('posts:follow_index')
+            plan.append((url, user))
+        return plan
+
+    def client(self, user):
+        """Клиент потока: анонимный или с сессией пользователя."""
+        clients = getattr(self.local, 'clients', None)
+        if clients is None:
+            clients = self.local.clients = {}
+        key = user.pk if user else None
+        if key not in clients:
+            clients[key] = Client()
+            if user:
+                clients[key].force_login(user)
+        return clients[key]
+
+    def fetch(self, url, user):
+        client = self.client(user)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = client.get(url)
+        return (
+            time.perf_counter() - start, recorder.count, response.status_code
+        )
+
+    def run(self, plan, concurrency):
+        start = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(concurrency) as executor:
+                samples = list(
+                    executor.map(lambda job: self.fetch(*job), plan)
+                )
+        else:
+            samples = [self.fetch(*job) for job in plan]
+        elapsed = time.perf_counter() - start
+        latencies = sorted(sample[0] * 1000 for sample in samples)
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for sample in samples if sample[2] >= 400),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'throughput_rps': round(len(samples) / elapsed, 1),
+            'queries_per_request': round(
+                sum(sample[1] for sample in samples) / len(samples), 1
+            ),
+        }
+
+    def print_table(self, results, output):
+        columns = (
+            'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps',
+            'queries_per_request', 'errors'
+        )
+        output.write(
+            f'{"endpoint":<14}' + ''.join(f'{name:>21}' for name in columns)
+        )
+        for endpoint, result in results.items():
+            output.write(
+                f'{endpoint:<14}'
+                + ''.join(f'{result[name]:>21}' for name in columns)
+            )
@@ -0,0 +1,245 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from posts import search, stats, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'лето море город утро дорога книга музыка ветер дом лес река друг '
+    'работа кофе вечер поезд снег солнце история мечта небо окно сад '
+    'идея проект встреча песня фото кино путь время свет'
+).split()
+
+
+def zipf_weights(size, exponent):
+    """Накопленные веса степенного распределения по рангу 1..size."""
+    return list(
+        accumulate(1 / rank ** exponent for rank in range(1, size + 1))
+    )
+
+
+@contextmanager
+def manual_pub_date(*models):
+    """Позволяет задать pub_date вручную, отключая auto_now_add."""
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу пользователями, группами, постами, комментариями '
+        'и подписками пачками bulk_create. Распределения перекошены как в '
+        'жизни: у немногих авторов почти все подписчики, несколько групп '
+        'собирают большую часть постов, популярные посты обрастают '
+        'длинными обсуждениями. При одном --seed данные совпадают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=300000)
+        parser.add_argument('--follows', type=int, default=200000)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до текущего момента разбросать даты.'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель степенного распределения популярности.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имён пользователей и адресов групп.'
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Общий пароль созданных пользователей.'
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.options = options
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix!r} уже есть: '
+                'укажите другой --prefix.'
+            )
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя.')
+
+        users = self.create_users()
+        groups = self.create_groups()
+        with manual_pub_date(Post, Comment):
+            posts = self.create_posts(users, groups)
+            self.create_comments(users, posts)
+        self.create_follows(users)
+
+        # bulk_create не шлёт сигналов: производные данные — заново.
+        self.log('Индекс поиска, счётчики и ленты подписок')
+        search.rebuild()
+        stats.rebuild()
+        timeline.rebuild()
+        cache.clear()
+        self.log('Готово')
+
+    def log(self, message):
+        self.stdout.write(f'{message}...')
+
+    def insert(self, model, objects):
+        """Сохраняет объекты пачками, каждую в своей транзакции."""
+        objects = iter(objects)
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                return
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+
+    def new_pks(self, queryset):
+        """Ключи только что вставленных строк по порядку вставки.
+
+        bulk_create возвращает ключи не на всех СУБД, поэтому они
+        перечитываются.
+        """
+        return list(queryset.order_by('pk').values_list('pk', flat=True))
+
+    def random_date(self, after=None):
+        start = after or self.now - timedelta(days=self.options['days'])
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=self.random.random() * span)
+
+    def random_text(self, words):
+        return ' '.join(self.random.choices(WORDS, k=words)).capitalize()
+
+    def create_users(self):
+        count, prefix = self.options['users'], self.options['prefix']
+        self.log(f'Пользователи: {count}')
+        password = make_password(self.options['password'])
+        self.insert(User, (
+            User(username=f'{prefix}{number}', password=password)
+            for number in range(count)
+        ))
+        return self.new_pks(
+            User.objects.filter(username__startswith=prefix)
+        )
+
+    def create_groups(self):
+        count, prefix = self.options['groups'], self.options['prefix']
+        self.log(f'Группы: {count}')
+        self.insert(Group, (
+            Group(
+                title=f'Группа {number}',
+                slug=f'{prefix}-{number}',
+                description=self.random_text(12),
+            )
+            for number in range(count)
+        ))
+        return self.new_pks(
+            Group.objects.filter(slug__startswith=f'{prefix}-')
+        )
+
+    def create_posts(self, users, groups):
+        count = self.options['posts']
+        self.log(f'Посты: {count}')
+        first_pk = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        # Пишут в основном немногие активные авторы, а среди групп
+        # есть несколько «горячих».
+        author_weights = zipf_weights(len(users), self.options['skew'])
+        group_weights = zipf_weights(len(groups), self.options['skew'])
+        dates = sorted(self.random_date() for _ in range(count))
+
+        def posts():
+            for pub_date in dates:
+                group = None
+                if groups and self.random.random() < 0.7:
+                    group = self.random.choices(
+                        groups, cum_weights=group_weights
+                    )[0]
+                yield Post(
+                    author_id=self.random.choices(
+                        users, cum_weights=author_weights
+                    )[0],
+                    group_id=group,
+                    text=self.random_text(self.random.randint(5, 60)),
+                    pub_date=pub_date,
+                )
+
+        self.insert(Post, posts())
+        return dict(
+            Post.objects.filter(pk__gt=first_pk).values_list('pk', 'pub_date')
+        )
+
+    def create_comments(self, users, posts):
+        """posts — даты публикации постов по их ключам."""
+        count = self.options['comments']
+        self.log(f'Комментарии: {count}')
+        if not posts:
+            return
+        # Посты перемешаны, чтобы длинные ветки были не только у старых.
+        ranked = self.random.sample(sorted(posts), len(posts))
+        post_weights = zipf_weights(len(ranked), self.options['skew'])
+
+        def comments():
+            for _ in range(count):
+                post = self.random.choices(
+                    ranked, cum_weights=post_weights
+                )[0]
+                yield Comment(
+                    post_id=post,
+                    author_id=self.random.choice(users),
+                    text=self.random_text(self.random.randint(3, 30)),
+                    pub_date=self.random_date(after=posts[post]),
+                )
+
+        self.insert(Comment, comments())
+        counts = Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+            'post'
+        ).annotate(count=Count('pk')).values('count')
+        Post.objects.filter(pk__gte=min(posts)).update(
+            comment_count=Coalesce(Subquery(counts), 0)
+        )
+
+    def create_follows(self, users):
+        count = min(
+            self.options['follows'], len(users) * (len(users) - 1)
+        )
+        self.log(f'Подписки: {count}')
+        # Число подписчиков автора подчиняется степенному закону.
+        ranked = self.random.sample(users, len(users))
+        author_weights = zipf_weights(len(ranked), self.options['skew'])
+        pairs = set()
+        while len(pairs) < count:
+            user = self.random.choice(users)
+            author = self.random.choices(
+                ranked, cum_weights=author_weights
+            )[0]
+            if user != author:
+                pairs.add((user, author))
+        self.insert(Follow, (
+            Follow(user_id=user, author_id=author)
+            for user, author in sorted(pairs)
+        ))
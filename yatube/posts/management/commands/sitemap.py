@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import sitemaps
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет карту сайта: пересобирает шарды, где появились новые '
+        'посты, профили или группы либо что-то удалено, и индекс. '
+        'Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересобрать все шарды, а не только устаревшие.'
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = sitemaps.refresh(full=options['full'])
+        for name in rebuilt:
+            self.stdout.write(name)
+        self.stdout.write(f'Пересобрано шардов: {len(rebuilt)}')
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, verbose_name='Оригинал')),
+                ('format', models.CharField(max_length=8, verbose_name='Формат')),
+                ('name', models.CharField(max_length=255, verbose_name='Файл')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+            ],
+            options={
+                'unique_together': {('source', 'width', 'format')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_authorstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SitemapShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=16, verbose_name='Раздел')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер')),
+                ('max_id', models.PositiveIntegerField(default=0, verbose_name='Собран до id')),
+                ('dirty', models.BooleanField(default=False, verbose_name='Нужно пересобрать')),
+                ('lastmod', models.DateTimeField(null=True, verbose_name='Собран')),
+            ],
+            options={
+                'unique_together': {('section', 'number')},
+            },
+        ),
+    ]
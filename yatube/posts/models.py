@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from sorl.thumbnail import default as thumbnails
 from core.models import TimeModelMixin
+from .storage import ContentAddressedStorage
 
 
 User = get_user_model()
@@ -36,6 +38,7 @@ class Post(TimeModelMixin):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True,
     )
@@ -44,9 +47,25 @@ class Post(TimeModelMixin):
         on_delete=models.CASCADE,
         verbose_name='Автор'
     )
+    comment_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'
+            ),
+            models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -66,6 +85,14 @@ class Comment(TimeModelMixin):
         verbose_name='Автор'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date'],
+                name='comment_post_date_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -83,6 +110,136 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('user', 'author')
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Последователь: '{self.user}', автор: '{self.author}'"
+
+
+class TimelineEntry(models.Model):
+    """Пост автора, доставленный в ленту подписок читателя."""
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        on_delete=models.CASCADE,
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline_entries',
+        on_delete=models.CASCADE,
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        verbose_name='Автор поста'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Лента '{self.user}': пост {self.post_id}"
+
+
+class PulledAuthor(models.Model):
+    """Автор, чьи посты не рассылаются подписчикам, а читаются с ленты.
+
+    Так помечаются авторы, у которых подписчиков больше
+    TIMELINE_FANOUT_LIMIT: рассылка их постов стоила бы слишком много
+    записей.
+    """
+    author = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='pulled',
+        on_delete=models.CASCADE,
+        verbose_name='Автор'
+    )
+
+    def __str__(self):
+        return str(self.author)
+
+
+class ImageVariant(models.Model):
+    """Заранее нарезанная копия картинки поста одной ширины и формата."""
+    source = models.CharField('Оригинал', max_length=255)
+    format = models.CharField('Формат', max_length=8)
+    name = models.CharField('Файл', max_length=255)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+
+    class Meta:
+        unique_together = ('source', 'width', 'format')
+
+    def __str__(self):
+        return f'{self.source}: {self.width}px {self.format}'
+
+    @property
+    def url(self):
+        return thumbnails.storage.url(self.name)
+
+
+class StoredFile(models.Model):
+    """Файл хранилища по содержимому и число ссылок на него."""
+    name = models.CharField('Файл', max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField('Ссылок', default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.refs}'
+
+
+class AuthorStats(models.Model):
+    """Счётчики пользователя: постов, подписчиков и подписок."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    posts = models.PositiveIntegerField('Постов', default=0)
+    followers = models.PositiveIntegerField('Подписчиков', default=0)
+    following = models.PositiveIntegerField('Подписок', default=0)
+
+    def __str__(self):
+        return f"Счётчики '{self.user}'"
+
+
+class SitemapShard(models.Model):
+    """Состояние одного файла карты сайта: до какого id он собран.
+
+    Шард покрывает SHARD_SIZE подряд идущих id раздела. Новые строки
+    пересобирают только шард, куда попали их id; удаления и
+    переименования помечают шард как dirty.
+    """
+    section = models.CharField('Раздел', max_length=16)
+    number = models.PositiveIntegerField('Номер')
+    max_id = models.PositiveIntegerField('Собран до id', default=0)
+    dirty = models.BooleanField('Нужно пересобрать', default=False)
+    lastmod = models.DateTimeField('Собран', null=True)
+
+    class Meta:
+        unique_together = ('section', 'number')
+
+    def __str__(self):
+        return f'{self.section}-{self.number}'
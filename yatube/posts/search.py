@@ -0,0 +1,122 @@
+"""Полнотекстовый поиск по постам.
+
+Тексты постов лежат в виртуальной таблице SQLite FTS5, rowid строки
+совпадает с id поста. Таблица обновляется сигналами при сохранении и
+удалении поста; после массовой загрузки её пересобирает rebuild().
+На других СУБД поиск откатывается к icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def build_query(text):
+    """Переводит строку пользователя в запрос FTS5.
+
+    Каждое слово берётся в кавычки, чтобы операторы FTS5 в запросе не
+    ломали разбор; последнее слово ищется по префиксу.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def index_post(post):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text]
+        )
+
+
+def unindex_post(post):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+
+
+def rebuild():
+    """Заново заполняет индекс по всей таблице постов."""
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table}'
+        )
+
+
+def filter_posts(queryset, text):
+    """Оставляет в queryset посты, подходящие под запрос (без ранжирования)."""
+    if not is_supported():
+        return queryset.filter(text__icontains=text)
+    query = build_query(text)
+    if not query:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [query]
+    ))
+
+
+class SearchResults:
+    """Найденные посты в порядке релевантности (bm25).
+
+    Поддерживает count() и срезы, поэтому отдаётся прямо в Paginator:
+    страница — это один запрос к индексу и один in_bulk по id.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.query = build_query(text) if is_supported() else ''
+
+    def _fallback(self):
+        return Post.objects.select_related('author', 'group').filter(
+            text__icontains=self.text
+        )
+
+    def count(self):
+        if not is_supported():
+            return self._fallback().count()
+        if not self.query:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [self.query]
+            )
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not is_supported():
+            return list(self._fallback()[index])
+        start, stop = index.start or 0, index.stop
+        if not self.query:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.query, stop - start, start]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
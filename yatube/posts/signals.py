@@ -0,0 +1,181 @@
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from core.cache import bump
+from . import follows, search, sitemaps, stats, timeline
+from .models import Comment, Follow, Group, Post, User
+from .utils import count_key, post_scopes
+
+
+# Посты, которые удаляются в этом потоке прямо сейчас.
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+def shift_counts(scopes, delta):
+    """Сдвигает счётчики постов перечисленных лент."""
+    for scope in scopes:
+        try:
+            if delta > 0:
+                cache.incr(count_key(scope), delta)
+            else:
+                cache.decr(count_key(scope), -delta)
+        except ValueError:
+            # Счётчика ещё нет: его посчитает первый же запрос ленты.
+            pass
+
+
+def release_image(storage, name):
+    """Снимает ссылку поста на файл картинки после коммита."""
+    if name:
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Без обращения к отложенному полю: оно потребовало бы запроса.
+    instance._saved_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    instance._saved_image = image if isinstance(image, str) else ''
+
+
+@receiver(pre_save, sender=Post)
+def note_upload(sender, instance, **kwargs):
+    # Новый файл сохраняется позже, в pre_save поля, и берёт свою ссылку
+    # даже при том же содержимом и, значит, том же имени.
+    instance._image_uploaded = bool(
+        instance.image and not instance.image._committed
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    search.index_post(instance)
+    tags = post_scopes(instance) + [f'post:{instance.pk}']
+    old_group_id = instance._saved_group_id
+    if created:
+        shift_counts(post_scopes(instance), 1)
+        stats.shift(instance.author_id, posts=1)
+        timeline.deliver(instance)
+    elif old_group_id != instance.group_id:
+        if old_group_id:
+            shift_counts([f'group:{old_group_id}'], -1)
+            tags.append(f'group:{old_group_id}')
+        if instance.group_id:
+            shift_counts([f'group:{instance.group_id}'], 1)
+    instance._saved_group_id = instance.group_id
+    if (
+        instance._saved_image != instance.image.name
+        or instance._image_uploaded
+    ):
+        release_image(instance.image.storage, instance._saved_image)
+        instance._saved_image = instance.image.name
+    bump(*tags)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # Каскад удалит комментарии поста раньше него самого.
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+    search.unindex_post(instance)
+    release_image(instance.image.storage, instance.image.name)
+    shift_counts(post_scopes(instance), -1)
+    stats.shift(instance.author_id, posts=-1)
+    sitemaps.mark_dirty('posts', instance.pk)
+    bump(*post_scopes(instance), f'post:{instance.pk}')
+
+
+def comment_changed(post_id, delta=0):
+    """Сдвигает счётчик комментариев и сбрасывает кэш поста и его лент."""
+    if delta:
+        Post.objects.filter(pk=post_id).update(
+            comment_count=F('comment_count') + delta
+        )
+    post = Post.objects.filter(pk=post_id).only(
+        'author_id', 'group_id'
+    ).first()
+    # Счётчик виден и на карточках лент, поэтому сбрасываются и они.
+    bump(f'post:{post_id}', *(post_scopes(post) if post else []))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    comment_changed(instance.post_id, 1 if created else 0)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    # Счётчик и кэш удаляемого поста не нужны: post_deleted сбросит кэш.
+    if instance.post_id not in deleting_posts():
+        comment_changed(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        # Адрес группы мог смениться вместе со slug.
+        sitemaps.mark_dirty('groups', instance.pk)
+    bump(f'group:{instance.pk}', f'group-info:{instance.pk}', 'feed:index')
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._saved_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if not created and instance._saved_username != instance.username:
+        sitemaps.mark_dirty('profiles', instance.pk)
+        # Имя автора и ссылка на профиль есть в карточках его постов, а
+        # значит, и в закэшированных страницах и фидах всех его лент.
+        groups = Post.objects.filter(
+            author_id=instance.pk, group__isnull=False
+        ).values_list('group_id', flat=True).distinct()
+        bump(
+            f'user-info:{instance.pk}', f'author:{instance.pk}', 'feed:index',
+            *(f'group:{group_id}' for group_id in groups),
+        )
+    instance._saved_username = instance.username
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    sitemaps.mark_dirty('profiles', instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        stats.shift(instance.user_id, following=1)
+        stats.shift(instance.author_id, followers=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        follows.changed(instance.user_id)
+        bump(f'author:{instance.author_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    stats.shift(instance.user_id, following=-1)
+    stats.shift(instance.author_id, followers=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    follows.changed(instance.user_id)
+    bump(f'author:{instance.author_id}')
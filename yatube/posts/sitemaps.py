@@ -0,0 +1,175 @@
+"""Карта сайта из шардов по 50 000 адресов.
+
+Разделы — посты, профили и группы. Шард раздела покрывает SHARD_SIZE
+подряд идущих id и пишется в свой файл потоком: строки читаются из
+таблицы кусками по CHUNK_SIZE и сразу уходят в файл. Обновление
+пересобирает только шарды, где появились id новее собранных, и шарды,
+помеченные dirty (удаление или переименование); шарды выше последнего
+id раздела удаляются, остальные файлы не трогаются. Индекс перечисляет
+все шарды. Собирает файлы команда manage.py sitemap, а отдают — view
+ниже, как есть, с диска.
+"""
+import os
+import tempfile
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Max
+from django.http import Http404
+from django.urls import reverse
+from django.utils import timezone
+from django.views.static import serve
+
+from .models import Group, Post, SitemapShard, User
+
+SHARD_SIZE = 50000
+CHUNK_SIZE = 2000
+INDEX_NAME = 'sitemap.xml'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def _post_rows(queryset):
+    for pk, pub_date in queryset.values_list('pk', 'pub_date').iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        yield reverse('posts:post_detail', kwargs={'post_id': pk}), pub_date
+
+
+def _profile_rows(queryset):
+    for username in queryset.values_list('username', flat=True).iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        yield reverse('posts:profile', kwargs={'username': username}), None
+
+
+def _group_rows(queryset):
+    for slug in queryset.values_list('slug', flat=True).iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        yield reverse('posts:group_list', kwargs={'group_slug': slug}), None
+
+
+# Раздел -> (модель, функция адресов и дат).
+SECTIONS = {
+    'posts': (Post, _post_rows),
+    'profiles': (User, _profile_rows),
+    'groups': (Group, _group_rows),
+}
+
+
+def shard_name(section, number):
+    return f'sitemap-{section}-{number}.xml'
+
+
+def shard_of(pk):
+    return (pk - 1) // SHARD_SIZE
+
+
+def mark_dirty(section, pk):
+    """Отмечает шард со строкой pk для пересборки."""
+    SitemapShard.objects.filter(
+        section=section, number=shard_of(pk)
+    ).update(dirty=True)
+
+
+def _write(name, lines):
+    """Пишет файл потоком и атомарно подменяет прежний."""
+    root = settings.SITEMAP_ROOT
+    os.makedirs(root, exist_ok=True)
+    descriptor, path = tempfile.mkstemp(dir=root, suffix='.tmp')
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as output:
+        output.writelines(lines)
+    os.chmod(path, 0o644)
+    os.replace(path, os.path.join(root, name))
+
+
+def _remove(name):
+    try:
+        os.remove(os.path.join(settings.SITEMAP_ROOT, name))
+    except FileNotFoundError:
+        pass
+
+
+def _shard_lines(section, number):
+    model, rows = SECTIONS[section]
+    base_url = settings.SITE_URL.rstrip('/')
+    low, high = number * SHARD_SIZE, (number + 1) * SHARD_SIZE
+    queryset = model.objects.filter(pk__gt=low, pk__lte=high).order_by('pk')
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n'
+    for location, lastmod in rows(queryset):
+        yield f'<url><loc>{escape(base_url + location)}</loc>'
+        if lastmod is not None:
+            yield f'<lastmod>{lastmod.date().isoformat()}</lastmod>'
+        yield '</url>\n'
+    yield '</urlset>\n'
+
+
+def _index_lines(shards):
+    base_url = settings.SITE_URL.rstrip('/')
+    yield (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<sitemapindex xmlns="{XMLNS}">\n'
+    )
+    for shard in shards:
+        location = base_url + reverse(
+            'posts:sitemap_shard',
+            kwargs={'name': shard_name(shard.section, shard.number)},
+        )
+        yield (
+            f'<sitemap><loc>{escape(location)}</loc>'
+            f'<lastmod>{shard.lastmod.isoformat()}</lastmod></sitemap>\n'
+        )
+    yield '</sitemapindex>\n'
+
+
+def refresh(full=False):
+    """Пересобирает устаревшие шарды и индекс; возвращает их имена."""
+    rebuilt = []
+    for section, (model, _) in SECTIONS.items():
+        max_id = model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0
+        states = {
+            shard.number: shard
+            for shard in SitemapShard.objects.filter(section=section)
+        }
+        last = shard_of(max_id) if max_id else -1
+        for number in sorted(states):
+            if number > last:
+                # Все строки шарда удалены: файл со старыми адресами
+                # не должен оставаться в индексе.
+                _remove(shard_name(section, number))
+                states.pop(number).delete()
+        for number in range(last + 1):
+            shard = states.get(number) or SitemapShard(
+                section=section, number=number
+            )
+            covered = min(max_id, (number + 1) * SHARD_SIZE)
+            if not (full or shard.dirty or shard.max_id < covered):
+                continue
+            _write(shard_name(section, number), _shard_lines(section, number))
+            shard.max_id = covered
+            shard.dirty = False
+            shard.lastmod = timezone.now()
+            shard.save()
+            rebuilt.append(shard_name(section, number))
+    _write(
+        INDEX_NAME,
+        _index_lines(SitemapShard.objects.order_by('section', 'number')),
+    )
+    return rebuilt
+
+
+def _serve(request, name):
+    try:
+        return serve(request, name, document_root=settings.SITEMAP_ROOT)
+    except Http404:
+        raise Http404('Карта сайта ещё не собрана.')
+
+
+def index(request):
+    return _serve(request, INDEX_NAME)
+
+
+def shard(request, name):
+    if not name.startswith('sitemap-'):
+        raise Http404
+    return _serve(request, name)
@@ -0,0 +1,86 @@
+"""Счётчики постов, подписчиков и подписок пользователей.
+
+AuthorStats хранит их готовыми, чтобы профиль, страница поста и
+пагинатор не считали COUNT(*) на каждый запрос. Счётчики сдвигаются
+атомарными F()-обновлениями в той же транзакции, что и изменение;
+недостающая запись пересчитывается по таблицам.
+"""
+from itertools import islice
+
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import AuthorStats, Follow, Post, User
+
+BATCH_SIZE = 1000
+
+
+def recount(user_id):
+    """Считает счётчики пользователя заново и сохраняет их."""
+    stats, _ = AuthorStats.objects.update_or_create(
+        pk=user_id,
+        defaults={
+            'posts': Post.objects.filter(author_id=user_id).count(),
+            'followers': Follow.objects.filter(author_id=user_id).count(),
+            'following': Follow.objects.filter(user_id=user_id).count(),
+        },
+    )
+    return stats
+
+
+def shift(user_id, **deltas):
+    """Сдвигает счётчики пользователя, например shift(pk, posts=1).
+
+    Недостающая запись пересчитывается только при росте счётчиков.
+    Уменьшение приходит и из каскадного удаления самого пользователя:
+    его запись к этому моменту может быть уже удалена, а пересчёт
+    вставил бы строку со ссылкой на удаляемого пользователя. Без записи
+    счётчики пересчитает stats_for при первом чтении.
+    """
+    updated = AuthorStats.objects.filter(pk=user_id).update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        recount(user_id)
+
+
+def stats_for(user):
+    """Счётчики пользователя; выбранные через select_related не читаются."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return recount(user.pk)
+
+
+def rebuild():
+    """Пересчитывает счётчики всех пользователей.
+
+    Нужен после массовой загрузки через bulk_create, которая не вызывает
+    сигналов.
+    """
+    def counts(queryset, field):
+        return dict(
+            queryset.values(field).annotate(
+                total=Count('pk')
+            ).values_list(field, 'total').order_by()
+        )
+
+    posts = counts(Post.objects, 'author_id')
+    followers = counts(Follow.objects, 'author_id')
+    following = counts(Follow.objects, 'user_id')
+    AuthorStats.objects.all().delete()
+    rows = (
+        AuthorStats(
+            pk=user_id,
+            posts=posts.get(user_id, 0),
+            followers=followers.get(user_id, 0),
+            following=following.get(user_id, 0),
+        )
+        for user_id in User.objects.values_list('pk', flat=True).iterator()
+    )
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            return
+        AuthorStats.objects.bulk_create(batch)
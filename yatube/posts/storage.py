@@ -0,0 +1,95 @@
+"""Хранилище картинок постов, адресуемое по содержимому.
+
+Имя файла — SHA-256 его содержимого, поэтому одинаковые загрузки
+хранятся и нарезаются один раз, а файл по адресу никогда не меняется и
+может кэшироваться навсегда. Сколько постов ссылается на файл, считает
+StoredFile; файл удаляется с диска вместе с нарезанными копиями, когда
+ссылок не остаётся.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail import default as thumbnails
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def _stored_files(self):
+        return apps.get_model('posts', 'StoredFile').objects
+
+    def save(self, name, content, max_length=None):
+        """Сохраняет файл под именем-хэшем; повтор только прибавляет ссылку.
+
+        Каталог из name (upload_to) сохраняется, исходное имя файла — нет.
+        """
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = content_hash(content)
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(
+            posixpath.dirname(name), digest[:2], f'{digest}{extension}'
+        )
+        if not self.exists(name):
+            try:
+                name = self._save(name, content)
+            except FileExistsError:
+                # Тот же файл только что записал параллельный запрос.
+                pass
+        self.acquire(name)
+        return name.replace('\\', '/')
+
+    def get_available_name(self, name, max_length=None):
+        """Занятое имя не заменяется другим: файл под ним тот же.
+
+        _save зовёт этот метод, когда файл успели создать между exists()
+        и записью; исключение прерывает запись, и save берёт готовый файл.
+        """
+        if self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    def acquire(self, name):
+        stored = self._stored_files()
+        if not stored.filter(name=name).update(refs=F('refs') + 1):
+            stored.get_or_create(name=name, defaults={'refs': 0})
+            stored.filter(name=name).update(refs=F('refs') + 1)
+
+    def delete(self, name):
+        """Снимает ссылку; файл и его копии удаляются вместе с последней."""
+        stored = self._stored_files()
+        with transaction.atomic():
+            if stored.filter(name=name, refs__gt=1).update(
+                refs=F('refs') - 1
+            ):
+                return
+            # Файлы, загруженные до этого хранилища, не учитывались и
+            # не удаляются, как и раньше.
+            if stored.filter(name=name).delete()[0]:
+                super().delete(name)
+                self._delete_variants(name)
+
+    def _delete_variants(self, name):
+        """Удаляет копии картинки, нарезанные из оригинала name."""
+        variants = apps.get_model('posts', 'ImageVariant').objects.filter(
+            source=name
+        )
+        for variant_name in variants.values_list('name', flat=True):
+            thumbnails.storage.delete(variant_name)
+        variants.delete()
+        thumbnails.backend.delete(name, delete_file=False)
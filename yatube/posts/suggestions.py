@@ -0,0 +1,172 @@
+"""Кого почитать: подсказки по графу подписок в памяти процесса.
+
+Граф подписок целиком читается из Follow одним потоковым запросом и
+хранится в форме CSR: отсортированный массив id читателей, массив
+смещений и один общий массив id авторов, на которых они подписаны.
+Подсказки — авторы, на которых подписаны те, на кого подписан
+пользователь, по числу таких путей; добор — самые читаемые авторы.
+Граф читается и перечитывается раз в FOLLOW_GRAPH_TTL секунд в фоновом
+потоке; пока он читается, подсказки строятся по прежнему, а до первого
+чтения их нет. bump(GRAPH_TAG) или очистка кэша заставляют перечитать
+его сразу.
+"""
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+
+from core.cache import tag_version
+from .follows import following_ids
+from .models import Follow, User
+
+GRAPH_TAG = 'follow-graph'
+CHUNK_SIZE = 10000
+# Сколько подписок пользователя и подписок каждой из них просматривать.
+MAX_SCAN = 500
+POPULAR_SIZE = 100
+SUGGESTIONS = 5
+
+_graph = None
+_loading = False
+_lock = threading.Lock()
+
+
+def _find(keys, key):
+    index = bisect_left(keys, key)
+    if index < len(keys) and keys[index] == key:
+        return index
+    return None
+
+
+class FollowGraph:
+    """Граф подписок в компактных массивах.
+
+    edges — пары (читатель, автор), упорядоченные по читателю; они
+    перебираются один раз и не держатся в памяти целиком.
+    """
+
+    def __init__(self, edges, version=None):
+        self.version = version
+        self.built = time.monotonic()
+        self.users = array('q')
+        self.offsets = array('q')
+        self.targets = array('q')
+        followers = Counter()
+        for user_id, author_id in edges:
+            if not self.users or self.users[-1] != user_id:
+                self.users.append(user_id)
+                self.offsets.append(len(self.targets))
+            self.targets.append(author_id)
+            followers[author_id] += 1
+        self.offsets.append(len(self.targets))
+        self.authors = array('q', sorted(followers))
+        self.followers = array('q', (followers[pk] for pk in self.authors))
+        self.popular = [
+            pk for pk, _ in heapq.nlargest(
+                POPULAR_SIZE, followers.items(), key=lambda item: item[1]
+            )
+        ]
+
+    def following(self, user_id, limit=None):
+        """id авторов, на которых подписан пользователь."""
+        index = _find(self.users, user_id)
+        if index is None:
+            return self.targets[0:0]
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        if limit is not None:
+            stop = min(stop, start + limit)
+        return self.targets[start:stop]
+
+    def follower_count(self, author_id):
+        index = _find(self.authors, author_id)
+        return 0 if index is None else self.followers[index]
+
+    def suggest(self, user_id, exclude=(), limit=SUGGESTIONS):
+        """До limit id авторов для пользователя, лучшие первыми.
+
+        exclude — кого не предлагать сверх уже известных графу подписок,
+        например подписки, сделанные после его построения.
+        """
+        skip = set(exclude)
+        skip.add(user_id)
+        followed = self.following(user_id)
+        skip.update(followed)
+        scores = Counter()
+        for author_id in islice(followed, MAX_SCAN):
+            for candidate in self.following(author_id, MAX_SCAN):
+                if candidate not in skip:
+                    scores[candidate] += 1
+        ranked = heapq.nsmallest(
+            limit, scores,
+            key=lambda pk: (-scores[pk], -self.follower_count(pk), pk),
+        )
+        skip.update(ranked)
+        ranked.extend(islice(
+            (pk for pk in self.popular if pk not in skip),
+            limit - len(ranked),
+        ))
+        return ranked
+
+
+def load():
+    """Читает граф из Follow потоком, кусками по CHUNK_SIZE строк."""
+    version = tag_version(GRAPH_TAG)
+    edges = Follow.objects.order_by('user_id', 'author_id').values_list(
+        'user_id', 'author_id'
+    )
+    return FollowGraph(edges.iterator(chunk_size=CHUNK_SIZE), version)
+
+
+def _reload():
+    global _graph, _loading
+    try:
+        _graph = load()
+    finally:
+        _loading = False
+        # У фонового потока своё соединение с БД.
+        connection.close()
+
+
+def graph():
+    """Текущий граф или None, пока первый ещё читается.
+
+    Устаревший и ещё не прочитанный граф читается в фоновом потоке, а
+    запрос не ждёт его: до конца чтения он получает прежний граф или
+    None. С FOLLOW_GRAPH_BACKGROUND=False граф читается прямо в запросе.
+    """
+    global _graph, _loading
+    current = _graph
+    if current is not None and current.version == tag_version(GRAPH_TAG) and (
+        time.monotonic() - current.built < settings.FOLLOW_GRAPH_TTL
+    ):
+        return current
+    with _lock:
+        if _graph is not current:
+            return _graph
+        if not settings.FOLLOW_GRAPH_BACKGROUND:
+            _graph = load()
+            return _graph
+        if not _loading:
+            _loading = True
+            threading.Thread(
+                target=_reload, name='follow-graph', daemon=True
+            ).start()
+    return current
+
+
+def suggestions_for(user, limit=SUGGESTIONS):
+    """Пользователи, на которых стоит подписаться, лучшие первыми."""
+    follow_graph = graph() if user.is_authenticated else None
+    if follow_graph is None:
+        return []
+    ids = follow_graph.suggest(user.pk, following_ids(user.pk), limit)
+    if not ids:
+        return []
+    users = User.objects.select_related('stats').in_bulk(ids)
+    return [users[pk] for pk in ids if pk in users]
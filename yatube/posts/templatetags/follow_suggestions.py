@@ -0,0 +1,16 @@
+from django import template
+
+from posts.suggestions import suggestions_for
+
+register = template.Library()
+
+
+@register.inclusion_tag(
+    'posts/includes/suggestions.html', takes_context=True
+)
+def follow_suggestions(context, exclude=None):
+    """Кого почитать пользователю страницы, кроме автора exclude."""
+    users = suggestions_for(context['request'].user)
+    return {
+        'suggestions': [user for user in users if user != exclude],
+    }
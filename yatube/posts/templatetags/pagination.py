@@ -0,0 +1,41 @@
+from django import template
+from django.template.loader import render_to_string
+
+from posts.utils import PAGE_WINDOW
+
+register = template.Library()
+
+
+def _query_prefix(request):
+    """Остальные GET-параметры запроса, чтобы ссылки страниц их сохраняли."""
+    if request is None:
+        return ''
+    params = request.GET.copy()
+    params.pop('page', None)
+    params.pop('cursor', None)
+    return params.urlencode() + '&' if params else ''
+
+
+@register.simple_tag(takes_context=True)
+def paginator(context, page_obj):
+    """Выводит навигацию, подходящую к типу страницы.
+
+    Для нумерованных страниц выводится только окно из PAGE_WINDOW ссылок
+    по обе стороны от текущей, а не весь page_range.
+    """
+    query = _query_prefix(context.get('request'))
+    # Страницы по курсору, в том числе as_page(), несут next_cursor.
+    if hasattr(page_obj, 'next_cursor'):
+        return render_to_string(
+            'posts/includes/cursor_paginator.html',
+            {'page_obj': page_obj, 'query': query}
+        )
+    number = page_obj.number
+    page_range = range(
+        max(1, number - PAGE_WINDOW),
+        min(page_obj.paginator.num_pages, number + PAGE_WINDOW) + 1
+    )
+    return render_to_string(
+        'posts/includes/paginator.html',
+        {'page_obj': page_obj, 'page_range': page_range, 'query': query}
+    )
@@ -0,0 +1,54 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.cache import tag_versions
+from posts.images import attach_pictures
+
+register = template.Library()
+
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_tags(post):
+    """Теги карточки: сам пост и имена автора и группы в её ссылках."""
+    tags = [f'post:{post.pk}', f'user-info:{post.author_id}']
+    if post.group_id:
+        tags.append(f'group-info:{post.group_id}')
+    return tags
+
+
+@register.simple_tag
+def post_cards(posts, template_name='includes/posts.html'):
+    """HTML карточек постов страницы, по возможности из кэша.
+
+    Ключ карточки содержит версии тегов card_tags, так что правка поста
+    или его комментариев сбрасывает только её, а смена имени автора или
+    адреса группы — все их карточки. Версии и карточки всей страницы
+    читаются двумя get_many, рендерятся только промахи; копии картинок
+    для них находятся одним запросом.
+    """
+    posts = list(posts)
+    tags = [card_tags(post) for post in posts]
+    versions = iter(tag_versions([tag for group in tags for tag in group]))
+    keys = [
+        f'post_card:{template_name}:{post.pk}:'
+        + '.'.join(next(versions) for _ in post_tags)
+        for post, post_tags in zip(posts, tags)
+    ]
+    cached = cache.get_many(keys)
+    attach_pictures(
+        post for key, post in zip(keys, posts) if key not in cached
+    )
+    rendered = {}
+    cards = []
+    for key, post in zip(keys, posts):
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string(template_name, {'post': post})
+            rendered[key] = card
+        cards.append(mark_safe(card))
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT)
+    return cards
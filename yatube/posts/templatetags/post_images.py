@@ -0,0 +1,14 @@
+from django import template
+
+from posts import images
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post):
+    """Картинка поста в нужных клиенту размерах или заглушка."""
+    return {
+        'post': post,
+        'picture': images.picture_or_schedule(post),
+    }
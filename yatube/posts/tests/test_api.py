@@ -0,0 +1,85 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.utils import encode_cursor
+
+User = get_user_model()
+
+
+class FeedApiTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='ApiAuthor')
+        cls.group = Group.objects.create(
+            title='API', slug='api-group', description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(25)
+        )
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_cursor_walks_every_post_once(self):
+        for url in (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_posts', args=['api-group']),
+            reverse('posts:api_profile', args=['ApiAuthor']),
+        ):
+            with self.subTest(url=url):
+                page = self.get(url, fields='id')
+                ids = [row['id'] for row in page['results']]
+                while page['next']:
+                    page = json.loads(
+                        b''.join(
+                            self.client.get(page['next']).streaming_content
+                        )
+                    )
+                    ids += [row['id'] for row in page['results']]
+                self.assertEqual(
+                    ids, list(Post.objects.values_list('id', flat=True))
+                )
+
+    def test_sparse_fields_and_single_query(self):
+        with CaptureQueriesContext(connection) as context:
+            page = self.get(
+                reverse('posts:api_index'), fields='text,author', limit=3
+            )
+        self.assertEqual(len(context), 1)
+        self.assertEqual(
+            page['results'][0], {'text': 'Пост 24', 'author': 'ApiAuthor'}
+        )
+        self.assertEqual(len(page['results']), 3)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'text,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_tampered_cursor_is_rejected(self):
+        for cursor in (
+            'не-курсор',
+            encode_cursor('n', ['garbage', 'x']),
+            encode_cursor('n', [None, None]),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    reverse('posts:api_index'), {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json()['error'])
@@ -0,0 +1,129 @@
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from posts.management.commands.benchmark import percentile
+from posts.models import (
+    Comment, Follow, Group, Post, PulledAuthor, TimelineEntry
+)
+
+User = get_user_model()
+
+
+@override_settings(FOLLOW_GRAPH_BACKGROUND=False)
+class BenchmarkCommandTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='bench', description='Описание'
+        )
+        Post.objects.create(author=cls.author, group=cls.group, text='Пост')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_report_covers_every_endpoint(self):
+        output, table = StringIO(), StringIO()
+        call_command(
+            'benchmark', requests=5, concurrency=1, json='-',
+            stdout=output, stderr=table,
+        )
+        report = json.loads(output.getvalue())
+        self.assertIn('p95_ms', table.getvalue())
+        self.assertEqual(set(report['endpoints']), {
+            'index', 'group_list', 'profile', 'post_detail', 'follow_index'
+        })
+        for result in report['endpoints'].values():
+            self.assertEqual(result['requests'], 5)
+            self.assertEqual(result['errors'], 0)
+            self.assertGreater(result['queries_per_request'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+
+class PercentileTests(TestCase):
+
+    def test_nearest_rank(self):
+        hundred = list(range(1, 101))
+        ten = list(range(1, 11))
+        cases = (
+            (hundred, 0.5, 50),
+            (hundred, 0.95, 95),
+            (hundred, 0.99, 99),
+            (hundred, 1, 100),
+            (hundred, 0.07, 7),
+            (ten, 0.5, 5),
+            (ten, 0.95, 10),
+            (ten, 0, 1),
+            ([], 0.5, 0.0),
+        )
+        for values, share, expected in cases:
+            with self.subTest(n=len(values), share=share):
+                self.assertEqual(percentile(values, share), expected)
+
+
+class SeedCommandTests(TestCase):
+
+    def seed(self, prefix):
+        call_command(
+            'seed', users=30, groups=4, posts=200, comments=300,
+            follows=100, batch_size=50, seed=7, prefix=prefix,
+            stdout=StringIO(),
+        )
+
+    @override_settings(TIMELINE_BACKFILL=3)
+    def test_creates_requested_volume(self):
+        self.seed('seed')
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 4)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Follow.objects.count(), 100)
+        self.assertFalse(
+            Comment.objects.filter(pub_date__lt=F('post__pub_date')).exists()
+        )
+        self.assertFalse(
+            Post.objects.annotate(
+                comments_total=Count('comments')
+            ).exclude(comment_count=F('comments_total')).exists()
+        )
+        pulled = set(PulledAuthor.objects.values_list('pk', flat=True))
+        for follow in Follow.objects.exclude(author_id__in=pulled):
+            with self.subTest(follow=follow.pk):
+                self.assertEqual(
+                    list(TimelineEntry.objects.filter(
+                        user_id=follow.user_id, author_id=follow.author_id
+                    ).values_list('post_id', flat=True)),
+                    list(Post.objects.filter(
+                        author_id=follow.author_id
+                    ).order_by('-pub_date', '-pk').values_list(
+                        'pk', flat=True
+                    )[:3]),
+                )
+        self.assertFalse(TimelineEntry.objects.filter(author_id__in=pulled))
+
+    def test_same_seed_gives_same_data(self):
+        def snapshot(prefix):
+            return [
+                (author[len(prefix):], text)
+                for author, text in Post.objects.filter(
+                    author__username__startswith=prefix
+                ).order_by('pk').values_list('author__username', 'text')
+            ]
+        self.seed('first')
+        self.seed('second')
+        self.assertEqual(snapshot('first'), snapshot('second'))
+
+    def test_skewed_followers(self):
+        self.seed('seed')
+        followers = sorted(
+            User.objects.annotate(
+                followers=Count('following')
+            ).values_list('followers', flat=True),
+            reverse=True,
+        )
+        self.assertGreater(followers[0], 5 * followers[len(followers) // 2])
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class SyndicationFeedTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Feeder')
+        cls.group = Group.objects.create(
+            title='Фиды', slug='feeds', description='Описание группы'
+        )
+        Post.objects.create(
+            text='В группе', author=cls.author, group=cls.group
+        )
+        Post.objects.create(text='Без группы', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_list_posts_of_their_scope(self):
+        cases = (
+            ('posts:index_rss', {}, ['В группе', 'Без группы']),
+            ('posts:group_atom', {'group_slug': 'feeds'}, ['В группе']),
+            ('posts:author_rss', {'username': 'Feeder'}, ['Без группы']),
+        )
+        for name, kwargs, texts in cases:
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, kwargs=kwargs))
+                self.assertIn('xml', response['Content-Type'])
+                for text in texts:
+                    self.assertContains(response, text)
+        self.assertNotContains(
+            self.client.get(reverse('posts:group_rss', args=['feeds'])),
+            'Без группы',
+        )
+
+    def test_feed_is_cached_until_its_scope_changes(self):
+        url = reverse('posts:group_rss', args=['feeds'])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        Post.objects.create(text='Без группы 2', author=self.author)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        Post.objects.create(
+            text='Новый в группе', author=self.author, group=self.group
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новый в группе')
+
+    def test_unknown_group_is_not_found(self):
+        response = self.client.get(reverse('posts:group_atom', args=['nope']))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,290 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import (
+    SimpleUploadedFile, TemporaryUploadedFile
+)
+from django.db import connection
+from django.test import (
+    Client, RequestFactory, TestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default as thumbnails
+
+from core.cache import tag_version
+from core.views import media
+from posts import images
+from posts.forms import PostForm
+from posts.models import ImageVariant, Post, StoredFile
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='photo.jpg', size=(1200, 800), fmt='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 50, 50)).save(buffer, fmt)
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), content_type=f'image/{fmt.lower()}'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class BackgroundThumbnailTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        images._failed.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_form_save_queues_thumbnail(self):
+        with mock.patch.object(images, 'schedule') as schedule:
+            self.client.post(
+                reverse('posts:post_create'),
+                {'text': 'С картинкой', 'image': make_image()},
+            )
+        post = Post.objects.get(text='С картинкой')
+        schedule.assert_called_once_with(post)
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        with mock.patch.object(images, '_submit') as submit:
+            response = self.client.get(url)
+        submit.assert_called_once()
+        self.assertContains(response, 'Картинка обрабатывается')
+        self.assertEqual(images.pictures([post.image.name]), {})
+
+        version = tag_version(f'post:{post.pk}')
+        images.generate(post.image.name, [f'post:{post.pk}'])
+        self.assertNotEqual(tag_version(f'post:{post.pk}'), version)
+        picture = images.pictures([post.image.name])[post.image.name]
+        self.assertEqual((picture.width, picture.height), (960, 339))
+        with mock.patch.object(images, '_submit') as submit:
+            response = self.client.get(url)
+        submit.assert_not_called()
+        self.assertContains(response, picture.src)
+        self.assertContains(response, 'srcset=')
+
+    def test_failed_thumbnail_is_not_retried_on_every_view(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        with mock.patch.object(
+            images.default.backend, 'get_thumbnail', side_effect=IOError
+        ) as thumbnail, self.assertLogs(images.logger, 'ERROR'):
+            self.client.get(url)
+            cache.clear()
+            self.client.get(url)
+        thumbnail.assert_called_once()
+        self.assertContains(self.client.get(url), 'Картинка обрабатывается')
+
+        # По истечении RETRY_AFTER картинка нарезается снова.
+        images._failed[post.image.name] = 0
+        self.client.get(url)
+        self.assertIn(post.image.name, images.pictures([post.image.name]))
+
+    @override_settings(IMAGE_VARIANT_WIDTHS=(320, 960))
+    def test_variants_are_recorded_once(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        images.generate(post.image.name, [])
+        images.generate(post.image.name, [])
+        formats = images.variant_formats()
+        variants = ImageVariant.objects.filter(source=post.image.name)
+        self.assertEqual(variants.count(), 2 * len(formats))
+        self.assertEqual(
+            set(variants.values_list('width', 'height')),
+            {(320, 113), (960, 339)},
+        )
+        picture = images.pictures([post.image.name])[post.image.name]
+        self.assertEqual(
+            picture.srcset,
+            ', '.join(f'{v.url} {v.width}w' for v in picture.jpeg),
+        )
+        self.assertEqual(bool(picture.webp), 'WEBP' in formats)
+
+    def test_page_resolves_pictures_in_one_query(self):
+        for number in range(3):
+            post = Post.objects.create(
+                author=self.user, text=f'Пост {number}', image=make_image()
+            )
+            images.generate(post.image.name, [])
+
+        def variant_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(reverse('posts:homepage'))
+            self.assertContains(response, '<picture>', count=3)
+            return [
+                query for query in context.captured_queries
+                if 'posts_imagevariant' in query['sql']
+            ]
+
+        self.assertEqual(len(variant_queries()), 1)
+
+
+class ImageIngestionTests(TestCase):
+
+    def form(self, upload):
+        return PostForm(data={'text': 'Пост'}, files={'image': upload})
+
+    @override_settings(IMAGE_MAX_SIDE=500)
+    def test_upload_is_downscaled_progressive_jpeg_without_exif(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGBA', (1200, 800), (0, 0, 0, 0)).save(
+            buffer, 'PNG', exif=exif
+        )
+        form = self.form(SimpleUploadedFile('shot.png', buffer.getvalue()))
+        self.assertTrue(form.is_valid(), form.errors)
+        upload = form.cleaned_data['image']
+        self.assertEqual(upload.name, 'shot.jpg')
+        image = Image.open(upload)
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (500, 333))
+        self.assertTrue(image.info.get('progressive'))
+        self.assertNotIn('exif', image.info)
+
+    @override_settings(IMAGE_MAX_PIXELS=100 * 100)
+    def test_oversized_image_is_rejected_before_decoding(self):
+        form = self.form(make_image(size=(200, 200)))
+        with mock.patch.object(Image.Image, 'load') as load:
+            self.assertFalse(form.is_valid())
+        load.assert_not_called()
+        self.assertEqual(
+            form.errors['image'], ['Слишком большая картинка: 200x200.']
+        )
+
+    @override_settings(IMAGE_MAX_DECODED_PIXELS=100 * 100)
+    def test_only_jpeg_may_exceed_decoded_limit(self):
+        self.assertTrue(self.form(make_image(size=(200, 200))).is_valid())
+        form = self.form(make_image('big.png', size=(200, 200), fmt='PNG'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors['image'], ['Слишком большая картинка: 200x200.']
+        )
+
+    def test_upload_on_disk_is_not_copied(self):
+        content = make_image().read()
+        upload = TemporaryUploadedFile(
+            'disk.jpg', 'image/jpeg', len(content), None
+        )
+        upload.write(content)
+        with mock.patch.object(upload, 'chunks') as chunks:
+            form = self.form(upload)
+            self.assertTrue(form.is_valid(), form.errors)
+        chunks.assert_not_called()
+        upload.close()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='memer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def post(self, upload):
+        return Post.objects.create(author=self.user, text='Мем', image=upload)
+
+    def test_same_content_is_stored_once(self):
+        first = self.post(make_image('meme.jpg'))
+        second = self.post(make_image('copy-of-meme.JPG'))
+        other = self.post(make_image('other.jpg', size=(10, 10)))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$'
+        )
+        self.assertEqual(
+            StoredFile.objects.get(name=first.image.name).refs, 2
+        )
+
+    def test_file_is_removed_with_last_reference(self):
+        first = self.post(make_image())
+        second = self.post(make_image())
+        storage, name = first.image.storage, first.image.name
+        storage.delete(name)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 1)
+        storage.delete(second.image.name)
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_concurrent_identical_upload_reuses_file(self):
+        first = self.post(make_image())
+        storage = first.image.storage
+        # Второй запрос не увидел файл, но тот появился до записи.
+        with mock.patch.object(
+            type(storage), 'exists', side_effect=[False, True]
+        ):
+            second = self.post(make_image('race.jpg'))
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(
+            StoredFile.objects.get(name=first.image.name).refs, 2
+        )
+        self.assertEqual(
+            os.listdir(os.path.dirname(storage.path(first.image.name))),
+            [os.path.basename(first.image.name)],
+        )
+
+    def test_variants_are_removed_with_last_reference(self):
+        post = self.post(make_image())
+        name = post.image.name
+        images.generate(name, [])
+        variants = list(ImageVariant.objects.filter(source=name))
+        self.assertTrue(thumbnails.storage.exists(variants[0].name))
+        post.image.storage.delete(name)
+        self.assertFalse(ImageVariant.objects.filter(source=name))
+        for variant in variants:
+            self.assertFalse(thumbnails.storage.exists(variant.name))
+
+    def test_reupload_of_same_image_keeps_one_reference(self):
+        post = self.post(make_image())
+        name = post.image.name
+        with mock.patch(
+            'posts.signals.transaction.on_commit', lambda func: func()
+        ):
+            for _ in range(2):
+                post.image = make_image('again.jpg')
+                post.save()
+        self.assertEqual(post.image.name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 1)
+
+    def test_media_is_served_immutable(self):
+        post = self.post(make_image())
+        request = RequestFactory().get(post.image.url)
+        response = media(
+            request, post.image.name, document_root=TEMP_MEDIA_ROOT
+        )
+        self.assertIn('immutable', response['Cache-Control'])
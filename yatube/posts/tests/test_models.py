@@ -1,6 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -34,3 +34,40 @@ class PostModelTest(TestCase):
         )
         post_text = post_2.text
         self.assertEqual(post_text[:15], str(post_2))
+
+
+class FeedIndexTests(TestCase):
+    """Запросы лент идут по составным индексам, без сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='indexed')
+        cls.group = Group.objects.create(
+            title='Индексы', slug='indexes', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост'
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feed_plans(self):
+        feeds = {
+            'post_date_idx': Post.objects.select_related('group')[:10],
+            'post_group_date_idx': self.group.group_posts.all()[:10],
+            'post_author_date_idx': Post.objects.filter(author=self.user)[:10],
+            'comment_post_date_idx': Comment.objects.filter(
+                post=self.post
+            ).order_by('pub_date')[:10],
+            'follow_author_user_idx': Follow.objects.filter(
+                author=self.user
+            ).values_list('user_id', flat=True),
+            'timeline_user_date_idx': self.user.timeline.all()[:10],
+        }
+        for index_name, queryset in feeds.items():
+            with self.subTest(index=index_name):
+                self.assertUsesIndex(queryset, index_name)
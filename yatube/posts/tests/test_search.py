@@ -0,0 +1,59 @@
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Кошки кошки и ещё раз кошки'
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.user, text='Собаки лучше, чем кошки'
+        )
+        Post.objects.create(author=cls.user, text='Про погоду')
+
+    def test_results_are_ranked(self):
+        response = self.client.get(reverse('posts:search'), {'q': 'кошки'})
+        self.assertEqual(
+            list(response.context['page_obj']), [self.cats, self.dogs]
+        )
+
+    def test_index_follows_edit_and_delete(self):
+        dogs = Post.objects.get(pk=self.dogs.pk)
+        dogs.text = 'Только собаки'
+        dogs.save()
+        self.assertEqual(
+            list(search.SearchResults('кошки')[:10]), [self.cats]
+        )
+        Post.objects.get(pk=self.cats.pk).delete()
+        self.assertEqual(search.SearchResults('кошки').count(), 0)
+
+    def test_query_syntax_is_escaped(self):
+        for query in ('"', 'NOT AND', '*', 'кош'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query}
+                )
+                self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('posts:search'), {'q': 'кош'})
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_admin_search_uses_index(self):
+        admin = site._registry[Post]
+        request = RequestFactory().get('/admin/posts/post/', {'q': 'погод'})
+        queryset, distinct = admin.get_search_results(
+            request, Post.objects.all(), 'погод'
+        )
+        self.assertEqual([post.text for post in queryset], ['Про погоду'])
+        self.assertIn(search.FTS_TABLE, str(queryset.query))
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import sitemaps
+from posts.models import Group, Post
+
+User = get_user_model()
+TEMP_SITEMAP_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(SITEMAP_ROOT=TEMP_SITEMAP_ROOT)
+@mock.patch.object(sitemaps, 'SHARD_SIZE', 2)
+class SitemapTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Mapper')
+        cls.group = Group.objects.create(
+            title='Карта', slug='map', description='Описание группы'
+        )
+        cls.posts = [
+            Post.objects.create(text=f'Пост {number}', author=cls.author)
+            for number in range(3)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_SITEMAP_ROOT, ignore_errors=True)
+
+    def read(self, name):
+        with open(os.path.join(TEMP_SITEMAP_ROOT, name)) as source:
+            return source.read()
+
+    def shard_with(self, post):
+        return sitemaps.shard_name('posts', sitemaps.shard_of(post.pk))
+
+    def test_index_lists_shards_with_absolute_urls(self):
+        call_command('sitemap', '--full', stdout=open(os.devnull, 'w'))
+        response = self.client.get(reverse('posts:sitemap'))
+        self.assertEqual(response.status_code, 200)
+        index = b''.join(response.streaming_content).decode()
+        for post in self.posts:
+            self.assertIn(settings.SITE_URL + reverse(
+                'posts:sitemap_shard', args=[self.shard_with(post)]
+            ), index)
+        self.assertIn('sitemap-profiles-', index)
+        self.assertIn('sitemap-groups-', index)
+
+    def test_shards_split_urls_by_id(self):
+        sitemaps.refresh()
+        for post in self.posts:
+            self.assertIn(
+                reverse('posts:post_detail', args=[post.pk]),
+                self.read(self.shard_with(post)),
+            )
+        first, last = self.posts[0], self.posts[-1]
+        if self.shard_with(first) != self.shard_with(last):
+            self.assertNotIn(
+                reverse('posts:post_detail', args=[last.pk]),
+                self.read(self.shard_with(first)),
+            )
+
+    def test_refresh_rebuilds_only_changed_shards(self):
+        sitemaps.refresh()
+        self.assertEqual(sitemaps.refresh(), [])
+        post = Post.objects.create(text='Новый', author=self.author)
+        self.assertEqual(sitemaps.refresh(), [self.shard_with(post)])
+        self.assertIn(
+            reverse('posts:post_detail', args=[post.pk]),
+            self.read(self.shard_with(post)),
+        )
+
+    def test_deleted_and_renamed_rows_mark_their_shard(self):
+        sitemaps.refresh()
+        post = Post.objects.get(pk=self.posts[0].pk)
+        Post.objects.filter(pk=post.pk).delete()
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'atlas'
+        group.save()
+        rebuilt = sitemaps.refresh()
+        self.assertIn(self.shard_with(post), rebuilt)
+        self.assertNotIn(
+            reverse('posts:post_detail', args=[post.pk]),
+            self.read(self.shard_with(post)),
+        )
+        self.assertIn(
+            reverse('posts:group_list', args=['atlas']),
+            self.read(sitemaps.shard_name(
+                'groups', sitemaps.shard_of(self.group.pk)
+            )),
+        )
+
+    def test_shards_above_last_row_are_removed(self):
+        post = Post.objects.create(text='Последний', author=self.author)
+        sitemaps.refresh()
+        name, first = self.shard_with(post), self.shard_with(self.posts[0])
+        Post.objects.filter(pk__gt=self.posts[0].pk).delete()
+        sitemaps.refresh()
+        self.assertNotEqual(name, first)
+        self.assertFalse(
+            os.path.exists(os.path.join(TEMP_SITEMAP_ROOT, name))
+        )
+        index = self.read(sitemaps.INDEX_NAME)
+        self.assertNotIn(name, index)
+        self.assertIn(first, index)
+
+    def test_unknown_file_is_not_found(self):
+        sitemaps.refresh()
+        response = self.client.get(
+            reverse('posts:sitemap_shard', args=['settings.py'])
+        )
+        self.assertEqual(response.status_code, 404)
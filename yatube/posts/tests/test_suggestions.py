@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow
+from posts import suggestions
+from posts.suggestions import FollowGraph, graph
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+
+    def test_csr_rows_and_follower_counts(self):
+        follow_graph = FollowGraph([(1, 2), (1, 3), (2, 3), (4, 3)])
+        self.assertEqual(list(follow_graph.following(1)), [2, 3])
+        self.assertEqual(list(follow_graph.following(3)), [])
+        self.assertEqual(follow_graph.follower_count(3), 3)
+        self.assertEqual(follow_graph.follower_count(1), 0)
+
+    def test_suggests_friends_of_friends_then_popular(self):
+        follow_graph = FollowGraph([
+            (1, 2), (1, 3),
+            (2, 4), (2, 5),
+            (3, 4), (3, 1),
+            (6, 7), (8, 7),
+        ])
+        # 4 — через двоих, 5 — через одного, 7 — популярный добор.
+        self.assertEqual(follow_graph.suggest(1, limit=3), [4, 5, 7])
+        self.assertEqual(follow_graph.suggest(1, exclude={4}), [5, 7])
+        self.assertEqual(FollowGraph([]).suggest(1), [])
+
+
+@override_settings(FOLLOW_GRAPH_BACKGROUND=False)
+class SuggestionPagesTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Seeker')
+        cls.friend = User.objects.create_user(username='Friend')
+        cls.star = User.objects.create_user(username='Star')
+        Follow.objects.create(user=cls.reader, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.star)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_follow_index_suggests_friends_of_friends(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Кого почитать')
+        self.assertContains(
+            response, reverse('posts:profile', kwargs={'username': 'Star'})
+        )
+
+    def test_followed_and_viewed_authors_are_not_suggested(self):
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'Star'})
+        )
+        self.assertNotContains(response, 'Кого почитать')
+        graph()
+        Follow.objects.create(user=self.reader, author=self.star)
+        # Граф ещё старый, но свежие подписки берутся из кэша подписок.
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Кого почитать')
+
+    @override_settings(FOLLOW_GRAPH_BACKGROUND=True)
+    def test_first_load_does_not_block_the_request(self):
+        with mock.patch.object(suggestions, '_graph', None), \
+                mock.patch.object(suggestions, '_loading', False), \
+                mock.patch.object(suggestions.threading, 'Thread') as thread:
+            self.assertEqual(suggestions.suggestions_for(self.reader), [])
+            self.assertEqual(suggestions.suggestions_for(self.reader), [])
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
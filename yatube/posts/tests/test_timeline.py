@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, PulledAuthor, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(FOLLOW_GRAPH_BACKGROUND=False)
+class TimelineTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.other = User.objects.create_user(username='other')
+        for i in range(12):
+            Post.objects.create(text=f'старый {i}', author=cls.author)
+        Post.objects.create(text='чужой', author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    @override_settings(TIMELINE_BACKFILL=5)
+    def test_backfill_takes_only_recent_posts(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.reader).order_by(
+                '-pub_date', '-post_id'
+            ).values_list('post_id', flat=True)),
+            list(Post.objects.filter(author=self.author).order_by(
+                '-pub_date', '-pk'
+            ).values_list('pk', flat=True)[:5]),
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'writer'})
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 12
+        )
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'writer'})
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+
+    def test_new_post_is_pushed_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='свежий', author=self.author)
+        Post.objects.create(text='мимо', author=self.other)
+        response = self.client.get(reverse('posts:follow_index'))
+        page = response.context['page_obj']
+        self.assertEqual(page[0], post)
+        self.assertEqual(type(page), Page)
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_follow_index_queries_do_not_grow(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other)
+        # Сессия, пользователь, авторы без рассылки, страница без COUNT,
+        # а также граф подписок и подписки читателя для подсказок.
+        with self.assertNumQueries(6):
+            self.client.get(reverse('posts:follow_index'))
+        # Авторы без рассылки и подписки читателя уже в кэше.
+        with self.assertNumQueries(3):
+            self.client.get(reverse('posts:follow_index'))
+
+    def test_follow_index_keyset(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        first = self.client.get(
+            reverse('posts:follow_index')
+        ).context['page_obj']
+        second = self.client.get(
+            reverse('posts:follow_index'), {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            [post.pk for post in first] + [post.pk for post in second],
+            list(Post.objects.filter(author=self.author).order_by(
+                '-pub_date', '-pk'
+            ).values_list('pk', flat=True))
+        )
+
+
+@override_settings(TIMELINE_FANOUT_LIMIT=1, FOLLOW_GRAPH_BACKGROUND=False)
+class HybridTimelineTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='writer')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_popular_author_is_pulled_and_merged(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.star)
+        Post.objects.create(text='до перехода', author=self.star)
+        Follow.objects.create(user=self.fan, author=self.star)
+        self.assertTrue(PulledAuthor.objects.filter(pk=self.star.pk))
+        self.assertFalse(TimelineEntry.objects.filter(author=self.star))
+
+        for i in range(14):
+            Post.objects.create(
+                text=str(i), author=self.star if i % 2 else self.author
+            )
+        self.assertFalse(TimelineEntry.objects.filter(author=self.star))
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+        url = reverse('posts:follow_index')
+        first = self.client.get(url).context['page_obj']
+        second = self.client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        back = self.client.get(
+            url, {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertFalse(second.has_next())
+        self.assertEqual(list(first) + list(second), expected)
+        self.assertEqual(list(back), list(first))
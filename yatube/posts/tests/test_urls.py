@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from http import HTTPStatus
 from posts.models import Group, Post
@@ -8,6 +8,7 @@ from posts.models import Group, Post
 User = get_user_model()
 
 
+@override_settings(FOLLOW_GRAPH_BACKGROUND=False)
 class StaticURLTests(TestCase):
     def setUp(self):
         self.guest_client = Client()
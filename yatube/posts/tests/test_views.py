@@ -4,17 +4,25 @@ from django.core.cache import cache
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
-from posts.models import Group, Post, Follow
+from posts.follows import following_ids
+from posts.models import AuthorStats, Comment, Group, Post, Follow
+from posts.utils import count_key, encode_cursor
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_WORKERS=0,
+    FOLLOW_GRAPH_BACKGROUND=False,
+)
 class TaskPagesTests(TestCase):
 
     @classmethod
@@ -263,7 +271,7 @@ class TaskPagesTests(TestCase):
         self.assertIsNotNone(first_object)
 
     def test_cache(self):
-        """Проверка кэширования постов на Главной"""
+        """Главная кэшируется, пока посты не меняются через модель."""
         cache.clear()
         new_post = Post.objects.create(
             text='Тест кеша',
@@ -274,11 +282,24 @@ class TaskPagesTests(TestCase):
         )
         first_object = response.context['posts'][0].text
         self.assertEqual(first_object, new_post.text)
+        # update() не шлёт сигналов — фрагмент остаётся прежним.
+        Post.objects.filter(pk=new_post.pk).update(text='Мимо кеша')
+        response_cached = self.authorized_client.get(
+            reverse('posts:homepage')
+        )
+        self.assertEqual(response.content, response_cached.content)
         new_post.delete()
         response_del = self.authorized_client.get(
             reverse('posts:homepage')
         )
-        self.assertEqual(response.content, response_del.content)
+        self.assertNotEqual(response.content, response_del.content)
+        self.assertNotContains(response_del, 'Тест кеша')
+
+    def test_cache_is_keyed_by_page(self):
+        cache.clear()
+        first = self.client.get(reverse('posts:homepage'))
+        second = self.client.get(reverse('posts:homepage'), {'page': 2})
+        self.assertNotEqual(first.content, second.content)
 
     def test_posts_followers(self):
         """Проверка пост появляется после подписки
@@ -356,3 +377,523 @@ class CommentsTests(TestCase):
             )
         )
         self.assertNotEqual(response_register, response_guest)
+
+
+@override_settings(KEYSET_PAGINATION=True, FOLLOW_GRAPH_BACKGROUND=False)
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='KeysetUser')
+        cls.group = Group.objects.create(
+            title='Курсоры',
+            description='Тестовое описание',
+            slug='keyset-slug'
+        )
+        Post.objects.bulk_create(
+            Post(text=str(i), author=cls.user, group=cls.group)
+            for i in range(14)
+        )
+        # Одинаковая дата у всех постов: порядок решает id.
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_walk_forward_and_back(self):
+        """Курсоры ведут по всем постам ленты без пропусков и повторов."""
+        urls = (
+            reverse('posts:homepage'),
+            reverse('posts:group_list', kwargs={'group_slug': 'keyset-slug'}),
+            reverse('posts:profile', kwargs={'username': 'KeysetUser'}),
+        )
+        expected = list(
+            Post.objects.order_by('-id').values_list('id', flat=True)
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                self.assertFalse(first.has_previous())
+                self.assertEqual(len(first), 10)
+                second = self.client.get(
+                    url, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertFalse(second.has_next())
+                self.assertEqual(
+                    [post.id for post in first] + [post.id for post in second],
+                    expected
+                )
+                back = self.client.get(
+                    url, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    [post.id for post in back], [post.id for post in first]
+                )
+                self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_shows_first_page(self):
+        post = Post.objects.first()
+        for cursor in (
+            'не-курсор',
+            encode_cursor('n', ['garbage', 'x']),
+            encode_cursor('n', [None, None]),
+            encode_cursor('p', [[1], {'id': 2}]),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    reverse('posts:homepage'), {'cursor': cursor}
+                )
+                self.assertEqual(len(response.context['page_obj']), 10)
+                self.assertFalse(response.context['page_obj'].has_previous())
+                response = self.client.get(
+                    reverse('posts:post_comments', args=[post.pk]),
+                    {'cursor': cursor},
+                )
+                self.assertEqual(response.status_code, 200)
+
+
+class EstimatedCountTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='CountUser')
+        Post.objects.bulk_create(
+            Post(text=str(i), author=cls.user) for i in range(14)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counter_replaces_count_query(self):
+        """Число постов берётся из счётчика, а окно ссылок ограничено."""
+        cache.set(count_key('feed:index'), 100000)
+        response = self.client.get(reverse('posts:homepage'), {'page': 500})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 14)
+        self.assertEqual(len(page_obj), 4)
+        self.assertEqual(cache.get(count_key('feed:index')), 14)
+
+        cache.clear()
+        cache.set(count_key('feed:index'), 100000)
+        response = self.client.get(reverse('posts:homepage'))
+        self.assertEqual(
+            response.context['page_obj'].paginator.num_pages, 10000
+        )
+        self.assertContains(response, 'class="page-link"', count=6)
+        self.assertContains(response, '?page=10000')
+
+    def test_low_estimate_is_corrected(self):
+        cache.set(count_key('feed:index'), 3)
+        response = self.client.get(reverse('posts:homepage'), {'page': 2})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(len(page_obj), 4)
+        self.assertFalse(page_obj.has_next())
+        self.assertEqual(cache.get(count_key('feed:index')), 14)
+
+    def test_counter_follows_created_and_deleted_posts(self):
+        self.client.get(reverse('posts:homepage'))
+        post = Post.objects.create(text='Новый', author=self.user)
+        self.assertEqual(cache.get(count_key('feed:index')), 15)
+        post.delete()
+        self.assertEqual(cache.get(count_key('feed:index')), 14)
+
+
+@override_settings(FOLLOW_GRAPH_BACKGROUND=False)
+class PostCardCacheTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='CardAuthor')
+        cls.reader = User.objects.create_user(username='CardReader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(text=f'Карточка {i}', author=cls.author)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_cards_are_cached_per_post(self):
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        for post in self.posts:
+            Post.objects.filter(pk=post.pk).update(text=f'Тихо {post.pk}')
+        response = self.client.get(url)
+        self.assertContains(response, 'Карточка 0')
+        self.assertNotContains(response, 'Тихо')
+
+        edited = Post.objects.get(pk=self.posts[1].pk)
+        edited.save()
+        response = self.client.get(url)
+        self.assertContains(response, f'Тихо {edited.pk}')
+        self.assertContains(response, 'Карточка 0')
+        self.assertContains(response, 'Карточка 2')
+
+    def test_cards_follow_group_rename(self):
+        group = Group.objects.create(
+            title='Карточная', slug='old-slug', description='Описание'
+        )
+        Post.objects.create(text='В группе', author=self.author, group=group)
+        for url in (reverse('posts:follow_index'), reverse('posts:homepage')):
+            self.client.get(url)
+        group.slug = 'new-slug'
+        group.save()
+        for url in (reverse('posts:follow_index'), reverse('posts:homepage')):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, '/group/new-slug/')
+                self.assertNotContains(response, '/group/old-slug/')
+
+    def test_pages_follow_author_rename(self):
+        group = Group.objects.create(
+            title='Карточная', slug='cards', description='Описание'
+        )
+        Post.objects.create(text='В группе', author=self.author, group=group)
+        urls = (
+            reverse('posts:follow_index'),
+            reverse('posts:homepage'),
+            reverse('posts:group_list', kwargs={'group_slug': 'cards'}),
+        )
+        for url in urls:
+            self.client.get(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'RenamedAuthor'
+        author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'RenamedAuthor')
+                self.assertNotContains(response, 'CardAuthor')
+
+
+class CommentPaginationTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Commentator')
+        cls.post = Post.objects.create(text='Обсуждаемый', author=cls.user)
+        cls.quiet = Post.objects.create(text='Тихий', author=cls.user)
+        authors = [
+            User.objects.create_user(username=f'reader{i}') for i in range(5)
+        ]
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=authors[i % 5], text=f'к{i}')
+            for i in range(45)
+        )
+        Comment.objects.create(post=cls.quiet, author=authors[0], text='к')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_query_count_does_not_depend_on_thread_size(self):
+        def queries(post):
+            url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(url)
+            return len(context)
+
+        self.assertEqual(queries(self.post), queries(self.quiet))
+
+    def test_load_more_walks_all_comments_in_order(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        page = response.context['comments']
+        texts = [comment.text for comment in page]
+        while page.has_next():
+            response = self.client.get(
+                reverse(
+                    'posts:post_comments', kwargs={'post_id': self.post.pk}
+                ),
+                {'cursor': page.next_cursor},
+            )
+            page = response.context['comments']
+            texts += [comment.text for comment in page]
+        self.assertEqual(texts, [f'к{i}' for i in range(45)])
+
+
+@override_settings(FOLLOW_GRAPH_BACKGROUND=False)
+class CommentCountTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Counter')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_count_follows_comments_and_shows_on_cards(self):
+        post = Post.objects.create(text='Пост', author=self.user)
+        self.client.get(reverse('posts:homepage'))
+        for text in ('первый', 'второй'):
+            self.client.post(
+                reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+                {'text': text},
+            )
+        Comment.objects.get(text='первый').delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        for url in (
+            reverse('posts:homepage'),
+            reverse('posts:profile', kwargs={'username': 'Counter'}),
+        ):
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.client.get(url), 'Комментариев: 1'
+                )
+
+    def test_post_delete_does_not_update_count_per_comment(self):
+        def delete_queries(comments):
+            post = Post.objects.create(text='Удаляемый', author=self.user)
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.user, text=str(i))
+                for i in range(comments)
+            )
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            return len(context)
+
+        self.assertEqual(delete_queries(2), delete_queries(20))
+        self.assertFalse(Comment.objects.exists())
+
+
+@override_settings(FOLLOW_GRAPH_BACKGROUND=False)
+class AuthorStatsTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Statistician')
+        cls.reader = User.objects.create_user(username='StatsReader')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_counts_follow_posts_and_follows(self):
+        self.client.post(
+            reverse('posts:post_create'), {'text': 'Пост читателя'}
+        )
+        post = Post.objects.create(text='Пост автора', author=self.author)
+        Post.objects.create(text='Ещё пост', author=self.author)
+        post.delete()
+        self.client.get(
+            reverse(
+                'posts:profile_follow', kwargs={'username': 'Statistician'}
+            )
+        )
+        author, reader = AuthorStats.objects.get(
+            pk=self.author.pk
+        ), AuthorStats.objects.get(pk=self.reader.pk)
+        self.assertEqual(
+            (author.posts, author.followers, author.following), (1, 1, 0)
+        )
+        self.assertEqual(
+            (reader.posts, reader.followers, reader.following), (1, 0, 1)
+        )
+        self.client.get(
+            reverse(
+                'posts:profile_unfollow', kwargs={'username': 'Statistician'}
+            )
+        )
+        self.assertEqual(
+            AuthorStats.objects.get(pk=self.author.pk).followers, 0
+        )
+
+    def test_users_with_posts_and_follows_can_be_deleted(self):
+        author = User.objects.create_user(username='Leaving')
+        reader = User.objects.create_user(username='LeavingReader')
+        Post.objects.create(text='Пост автора', author=author)
+        Post.objects.create(text='Пост читателя', author=reader)
+        Follow.objects.create(user=reader, author=author)
+        Follow.objects.create(user=author, author=reader)
+        reader_pk, author_pk = reader.pk, author.pk
+        reader.delete()
+        connection.check_constraints()
+        self.assertFalse(AuthorStats.objects.filter(pk=reader_pk))
+        stats = AuthorStats.objects.get(pk=author_pk)
+        self.assertEqual(
+            (stats.posts, stats.followers, stats.following), (1, 0, 0)
+        )
+        author.delete()
+        connection.check_constraints()
+        self.assertFalse(AuthorStats.objects.filter(pk=author_pk))
+
+    def test_pages_read_counts_without_count_queries(self):
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        post = Post.objects.filter(author=self.author).first()
+        for url in (
+            reverse('posts:profile', kwargs={'username': 'Statistician'}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url)
+                self.assertContains(response, '3')
+                self.assertFalse([
+                    query for query in context.captured_queries
+                    if 'COUNT(' in query['sql']
+                    and 'posts_post' in query['sql']
+                ])
+
+
+@override_settings(FOLLOW_GRAPH_BACKGROUND=False)
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Etagger')
+        cls.group = Group.objects.create(
+            title='Валидаторы', slug='etag-group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self):
+        return (
+            reverse('posts:homepage'),
+            reverse('posts:group_list', kwargs={'group_slug': 'etag-group'}),
+            reverse('posts:profile', kwargs={'username': 'Etagger'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_unchanged_pages_answer_not_modified(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                etag = response['ETag']
+                self.assertEqual(
+                    self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                    304,
+                )
+                self.assertEqual(
+                    self.client.get(
+                        url,
+                        HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+                    ).status_code,
+                    304,
+                )
+
+    def test_changes_and_users_get_fresh_pages(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        Comment.objects.create(post=self.post, author=self.author, text='к')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+        url = reverse('posts:homepage')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_author_rename_gets_fresh_pages_and_feeds(self):
+        urls = (
+            reverse('posts:homepage'),
+            reverse('posts:group_list', kwargs={'group_slug': 'etag-group'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:index_rss'),
+            reverse('posts:group_atom', kwargs={'group_slug': 'etag-group'}),
+        )
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'Renamed'
+        author.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Renamed')
+                self.assertNotContains(response, 'Etagger')
+
+    def test_new_login_gets_fresh_csrf_token(self):
+        self.author.set_password('пароль-для-теста')
+        self.author.save()
+        client = Client(enforce_csrf_checks=True)
+        login_url = reverse('users:login')
+
+        def log_in():
+            client.get(login_url)
+            client.post(login_url, {
+                'username': 'Etagger',
+                'password': 'пароль-для-теста',
+                'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+            })
+
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        log_in()
+        etag = client.get(url)['ETag']
+        client.post(reverse('users:logout'), {
+            'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+        })
+        log_in()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {
+                'text': 'После входа',
+                'csrfmiddlewaretoken': response.context['csrf_token'],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(FOLLOW_GRAPH_BACKGROUND=False)
+class FollowCacheTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Followed')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=cls.other, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def profile(self):
+        return self.client.get(
+            reverse('posts:profile', kwargs={'username': 'Followed'})
+        )
+
+    def test_following_is_checked_for_requesting_user(self):
+        self.assertFalse(self.profile().context['following'])
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'Followed'})
+        )
+        self.assertTrue(self.profile().context['following'])
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'Followed'})
+        )
+        self.assertFalse(self.profile().context['following'])
+
+    def test_follow_set_is_read_from_cache(self):
+        self.assertEqual(following_ids(self.other.pk), {self.author.pk})
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(
+                following_ids(self.other.pk), {self.author.pk}
+            )
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'posts_follow' in query['sql']
+        ])
@@ -0,0 +1,221 @@
+"""Лента подписок: гибрид fan-out on write и чтения при запросе.
+
+Пост обычного автора сразу раскладывается в ленты всех его подписчиков,
+подписка дописывает в ленту старые посты автора, отписка их удаляет.
+Посты авторов, помеченных PulledAuthor (подписчиков больше
+TIMELINE_FANOUT_LIMIT), никуда не раскладываются: при чтении ленты они
+выбираются по индексу автора и сливаются с разложенными записями.
+Список таких авторов и подписки читателя берутся из кэша.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from core.cache import bump, get_or_set
+from .follows import following_ids
+from .models import AuthorStats, Follow, Post, PulledAuthor, TimelineEntry
+from .utils import FEED_KEYS, keyset_filter
+
+BATCH_SIZE = 1000
+TIMELINE_KEYS = ('pub_date', 'post_id')
+PULLED_TAG = 'timeline:pulled'
+PULLED_TIMEOUT = 60 * 60 * 24
+
+
+def _insert(entries):
+    """Пишет записи ленты пачками, не собирая их все в памяти."""
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_pulled(author_id):
+    return PulledAuthor.objects.filter(pk=author_id).exists()
+
+
+def pulled_authors():
+    """frozenset id авторов, чьи посты подмешиваются при чтении."""
+    return get_or_set(
+        'pulled-authors',
+        [PULLED_TAG],
+        lambda: frozenset(PulledAuthor.objects.values_list('pk', flat=True)),
+        PULLED_TIMEOUT,
+    )
+
+
+def deliver(post):
+    """Кладёт новый пост в ленты подписчиков его автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Дописывает в ленту читателя последние посты нового автора.
+
+    Берётся не больше TIMELINE_BACKFILL постов, чтобы подписка на
+    плодовитого автора не вставляла в запросе всю его историю.
+
+    Когда у автора становится больше TIMELINE_FANOUT_LIMIT подписчиков,
+    он переводится на чтение при запросе, а его записи из лент удаляются.
+    """
+    if is_pulled(author_id):
+        return
+    followers = AuthorStats.objects.filter(pk=author_id).values_list(
+        'followers', flat=True
+    ).first() or 0
+    if followers > settings.TIMELINE_FANOUT_LIMIT:
+        PulledAuthor.objects.get_or_create(pk=author_id)
+        bump(PULLED_TAG)
+        TimelineEntry.objects.filter(author_id=author_id).delete()
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    _insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild():
+    """Заново раскладывает ленты всех читателей по таблице подписок.
+
+    Нужен после массовой загрузки через bulk_create, которая не вызывает
+    сигналов. Раскладка делается одним INSERT ... SELECT на стороне БД;
+    как и при подписке, каждой подписке достаются только последние
+    TIMELINE_BACKFILL постов автора.
+    """
+    TimelineEntry.objects.all().delete()
+    PulledAuthor.objects.all().delete()
+    crowded = Follow.objects.values('author_id').annotate(
+        followers=Count('id')
+    ).filter(
+        followers__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True)
+    PulledAuthor.objects.bulk_create(
+        [PulledAuthor(pk=author_id) for author_id in crowded],
+        batch_size=BATCH_SIZE,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            '(user_id, post_id, author_id, pub_date) '
+            'SELECT user_id, post_id, author_id, pub_date FROM ('
+            'SELECT f.user_id, p.id AS post_id, p.author_id, p.pub_date, '
+            'ROW_NUMBER() OVER ('
+            'PARTITION BY f.id ORDER BY p.pub_date DESC, p.id DESC'
+            ') AS position '
+            f'FROM {Follow._meta.db_table} f '
+            f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+            'WHERE f.author_id NOT IN '
+            f'(SELECT author_id FROM {PulledAuthor._meta.db_table})'
+            ') recent WHERE position <= %s',
+            [settings.TIMELINE_BACKFILL],
+        )
+    bump(PULLED_TAG)
+
+
+def _post_key(post):
+    return post.pub_date, post.pk
+
+
+class HomeTimeline:
+    """Лента подписок пользователя, сливающая k упорядоченных потоков.
+
+    Один поток — разложенные записи TimelineEntry, остальные — посты
+    каждого PulledAuthor, на которого подписан пользователь. Каждый поток
+    читается по своему индексу не дальше нужной страницы. Объект
+    поддерживает count() и срезы, поэтому его можно отдать Paginator, и
+    keyset_window() для KeysetPaginator.
+    """
+    model = Post
+
+    def __init__(self, user):
+        self.entries = user.timeline.select_related(
+            'post__author', 'post__group'
+        )
+        pulled = pulled_authors()
+        self.pulled = sorted(following_ids(user.pk) & pulled) if pulled else []
+
+    def _author_posts(self, author_id):
+        return Post.objects.select_related('author', 'group').filter(
+            author_id=author_id
+        ).order_by('-pub_date', '-pk')
+
+    def _merge(self, entries, posts, descending=True):
+        streams = [(entry.post for entry in entries)] + posts
+        return heapq.merge(*streams, key=_post_key, reverse=descending)
+
+    def count(self):
+        count = self.entries.count()
+        if self.pulled:
+            count += Post.objects.filter(author_id__in=self.pulled).count()
+        return count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        merged = self._merge(
+            self.entries[:stop],
+            [self._author_posts(pk)[:stop] for pk in self.pulled],
+        )
+        return list(islice(merged, start, stop))
+
+    def keyset_window(self, values, forward, limit):
+        """Следующие limit постов после ключа values (или до него)."""
+        lookup = 'lt' if forward else 'gt'
+        entries, posts = self.entries, [
+            self._author_posts(pk) for pk in self.pulled
+        ]
+        if values is not None:
+            entries = entries.filter(
+                keyset_filter(TIMELINE_KEYS, values, lookup)
+            )
+            posts = [
+                queryset.filter(keyset_filter(FEED_KEYS, values, lookup))
+                for queryset in posts
+            ]
+        entries = entries.order_by(
+            *[f'-{key}' if forward else key for key in TIMELINE_KEYS]
+        )
+        posts = [
+            queryset.order_by(
+                *[f'-{key}' if forward else key for key in FEED_KEYS]
+            )
+            for queryset in posts
+        ]
+        merged = self._merge(
+            entries[:limit],
+            [queryset[:limit] for queryset in posts],
+            descending=forward,
+        )
+        return list(islice(merged, limit))
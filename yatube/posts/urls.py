@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, feeds, sitemaps, views
 
 
 app_name = 'posts'
@@ -11,7 +11,13 @@ urlpatterns = [
         views.group_posts, name='group_list'
     ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('search/', views.search, name='search'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_update'),
     path(
@@ -19,6 +25,29 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path('api/posts/', api.index, name='api_index'),
+    path(
+        'api/group/<group_slug>/posts/',
+        api.group_posts,
+        name='api_group_posts'
+    ),
+    path(
+        'api/profile/<str:username>/posts/',
+        api.profile,
+        name='api_profile'
+    ),
+    path('rss/', feeds.index_rss, name='index_rss'),
+    path('atom/', feeds.index_atom, name='index_atom'),
+    path('group/<group_slug>/rss/', feeds.group_rss, name='group_rss'),
+    path('group/<group_slug>/atom/', feeds.group_atom, name='group_atom'),
+    path('profile/<str:username>/rss/', feeds.author_rss, name='author_rss'),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.author_atom,
+        name='author_atom'
+    ),
+    path('sitemap.xml', sitemaps.index, name='sitemap'),
+    path('sitemaps/<str:name>', sitemaps.shard, name='sitemap_shard'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
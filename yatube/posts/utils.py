@@ -1,10 +1,299 @@
-from django.core.paginator import Paginator
+import base64
+import json
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .models import Group, User
 
 SHOW_POSTS = 10
+SHOW_COMMENTS = 20
+PAGE_WINDOW = 3
+COUNT_TIMEOUT = 60 * 60
+FEED_KEYS = ('pub_date', 'id')
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, values):
+    """Упаковывает направление и значения ключа в непрозрачную строку."""
+    # isoformat, а не DjangoJSONEncoder: тот обрезает микросекунды.
+    raw = json.dumps(
+        [direction, values], default=lambda value: value.isoformat()
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор. Для битого курсора возвращает None."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded))
+    except (TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+class InvalidCursor(Exception):
+    """Курсор не распаковывается или его значения не подходят к ключам."""
+
+
+def keyset_filter(keys, values, lookup):
+    """Условие лексикографического сравнения кортежа ключей с values."""
+    condition = Q()
+    for position, key in enumerate(keys):
+        exact = dict(zip(keys[:position], values[:position]))
+        exact[f'{key}__{lookup}'] = values[position]
+        condition |= Q(**exact)
+    return condition
+
+
+class KeysetPage(Sequence):
+    """Страница ленты, выбранная по курсору, а не по номеру."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Keyset page of {len(self)}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class _NeighbourPages:
+    """Paginator для Page по курсору: знает только, есть ли соседи.
+
+    Номера страниц условные (1 — первая, 2 — любая дальше), их хватает
+    для has_next() и has_previous() у Page.
+    """
+
+    def __init__(self, per_page, num_pages):
+        self.per_page = per_page
+        self.num_pages = num_pages
+        self.count = None
+
+
+def as_page(keyset_page, per_page):
+    """Страница по курсору в виде django Page с next_cursor/previous_cursor.
+
+    Нужна там, где ждут именно Page, а выбирать страницу нужно по ключу.
+    """
+    number = 2 if keyset_page.has_previous() else 1
+    page = Page(
+        list(keyset_page),
+        number,
+        _NeighbourPages(per_page, number + keyset_page.has_next()),
+    )
+    page.next_cursor = keyset_page.next_cursor
+    page.previous_cursor = keyset_page.previous_cursor
+    return page
+
+
+class KeysetPaginator:
+    """Пагинация по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Стоимость страницы не зависит от её глубины: каждая страница —
+    это диапазонный проход по индексу от значения ключа из курсора.
+    По умолчанию страницы идут от новых к старым, с descending=False —
+    от старых к новым.
+    """
+
+    def __init__(self, object_list, per_page, keys=FEED_KEYS,
+                 descending=True):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.keys = keys
+        self.descending = descending
+
+    def _to_python(self, values):
+        opts = self.object_list.model._meta
+        try:
+            values = [
+                opts.get_field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor
+        # Курсор подделан: в ключах ленты NULL не бывает.
+        if any(value is None for value in values):
+            raise InvalidCursor
+        return values
+
+    def _key(self, obj):
+        # Строки values() — словари, остальное — объекты.
+        if isinstance(obj, dict):
+            return [obj[key] for key in self.keys]
+        return [getattr(obj, key) for key in self.keys]
+
+    def _window(self, values, forward, limit):
+        """limit объектов за ключом values в порядке обхода.
+
+        Источники, которые не являются QuerySet, выбирают окно сами
+        через метод keyset_window.
+        """
+        keyset_window = getattr(self.object_list, 'keyset_window', None)
+        if keyset_window is not None:
+            return keyset_window(values, forward, limit)
+        queryset = self.object_list
+        down = forward == self.descending
+        if values is not None:
+            queryset = queryset.filter(
+                keyset_filter(self.keys, values, 'lt' if down else 'gt')
+            )
+        ordering = [f'-{key}' if down else key for key in self.keys]
+        return list(queryset.order_by(*ordering)[:limit])
+
+    def get_page(self, cursor=None):
+        """Страница по курсору; с битым курсором — первая страница."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
+
+    def page(self, cursor=None):
+        """Страница по курсору; битый курсор — ошибка InvalidCursor."""
+        if not cursor:
+            direction, values = NEXT, None
+        else:
+            decoded = decode_cursor(cursor)
+            if decoded is None or len(decoded[1]) != len(self.keys):
+                raise InvalidCursor
+            direction, values = decoded[0], self._to_python(decoded[1])
+        forward = direction == NEXT
+        rows = self._window(values, forward, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        has_next = has_more if forward else True
+        has_previous = values is not None if forward else has_more
+        if not rows:
+            return KeysetPage(rows)
+        return KeysetPage(
+            rows,
+            encode_cursor(NEXT, self._key(rows[-1])) if has_next else None,
+            encode_cursor(PREVIOUS, self._key(rows[0]))
+            if has_previous else None,
+        )
+
+
+def count_key(scope):
+    return f'posts_count:{scope}'
+
+
+def post_scopes(post):
+    """Ленты, в которые попадает пост: общая, группы и автора."""
+    scopes = ['feed:index', f'author:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+def group_tags(request, group_slug):
+    """Теги ленты группы по её slug для tagged_condition."""
+    group_id = Group.objects.filter(slug=group_slug).values_list(
+        'pk', flat=True
+    ).first()
+    return [f'group:{group_id}']
+
+
+def author_tags(request, username):
+    """Теги ленты автора по его имени для tagged_condition."""
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    return [f'author:{author_id}']
+
+
+class EstimatedPaginator(Paginator):
+    """Paginator, который берёт число постов из счётчика вместо COUNT(*).
+
+    Счётчик живёт в кэше и сдвигается сигналами при создании и удалении
+    постов. Оценка влияет только на номер последней страницы: наличие
+    следующей страницы определяется по лишней выбранной строке, а по
+    неполной странице счётчик поправляется до точного значения.
+    """
+
+    def __init__(self, object_list, per_page, scope, count=None):
+        super().__init__(object_list, per_page)
+        self.scope = scope
+        if count is not None:
+            # Точное число уже известно, например из AuthorStats.
+            self.__dict__['count'] = count
+
+    @cached_property
+    def count(self):
+        count = cache.get(count_key(self.scope))
+        if count is None:
+            count = self._store_count(self.object_list.count())
+        return count
+
+    def _store_count(self, count):
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        cache.set(count_key(self.scope), count, COUNT_TIMEOUT)
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            self._store_count(self.object_list.count())
+            raise EmptyPage('That page contains no results')
+        seen = bottom + len(rows)
+        exact = len(rows) <= self.per_page
+        if seen > self.count or exact and seen != self.count:
+            self._store_count(seen)
+        return self._get_page(rows[:self.per_page], number, self)
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            return self.page(self.num_pages)
 
 
-def paginate_posts(request, posts):
-    paginator = Paginator(posts, SHOW_POSTS)
+def paginate_posts(request, posts, scope=None, keyset=None, count=None):
+    if keyset is None:
+        keyset = settings.KEYSET_PAGINATION
+    if keyset:
+        paginator = KeysetPaginator(posts, SHOW_POSTS)
+        return paginator.get_page(request.GET.get('cursor'))
+    if scope is None:
+        paginator = Paginator(posts, SHOW_POSTS)
+    else:
+        paginator = EstimatedPaginator(posts, SHOW_POSTS, scope, count)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
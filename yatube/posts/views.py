@@ -1,15 +1,37 @@
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import render, get_object_or_404, redirect
+from core.cache import tagged_condition
+from .follows import is_following
 from .forms import PostForm, CommentForm
-from .models import Group, Post, Comment, Follow, User
-from .utils import paginate_posts
+from .models import Group, Post, Follow, User
+from .search import SearchResults
+from .stats import stats_for
+from .timeline import HomeTimeline
+from .utils import (
+    SHOW_COMMENTS, SHOW_POSTS, KeysetPaginator, as_page, author_tags,
+    group_tags, paginate_posts
+)
 
 POST_ON_PAGE = 10
 
 
+def profile_tags(request, username):
+    # Кнопка подписки зависит от подписок того, кто смотрит.
+    return author_tags(request, username) + [f'follow:{request.user.pk}']
+
+
+def post_tags(request, post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True
+    ).first()
+    return [f'post:{post_id}', f'author:{author_id}']
+
+
+@tagged_condition(lambda request: ['feed:index'])
 def index(request):
-    posts = Post.objects.select_related('group').all()
-    page_obj = paginate_posts(request, posts)
+    posts = Post.objects.select_related('author', 'group').all()
+    page_obj = paginate_posts(request, posts, scope='feed:index')
     context = {
         'posts': posts,
         'page_obj': page_obj,
@@ -18,10 +40,11 @@ def index(request):
     return render(request, template, context)
 
 
+@tagged_condition(group_tags)
 def group_posts(request, group_slug):
     group = get_object_or_404(Group, slug=group_slug)
-    posts = group.group_posts.all()
-    page_obj = paginate_posts(request, posts)
+    posts = group.group_posts.select_related('author', 'group')
+    page_obj = paginate_posts(request, posts, scope=f'group:{group.pk}')
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -29,34 +52,72 @@ def group_posts(request, group_slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@tagged_condition(profile_tags)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.select_related('author').filter(author=author)
-    page_obj = paginate_posts(request, posts)
-    following = request.user.is_authenticated and author.following.exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = stats_for(author)
+    posts = Post.objects.select_related('author', 'group').filter(
+        author=author
+    )
+    page_obj = paginate_posts(
+        request, posts, scope=f'author:{author.pk}', count=stats.posts
+    )
     context = {
         'author': author,
+        'stats': stats,
         'posts': posts,
         'page_obj': page_obj,
         'username': username,
-        'following': following,
+        'following': is_following(request.user, author),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = paginate_posts(request, SearchResults(query), keyset=False)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def comments_page(request, post):
+    """Страница комментариев поста от старых к новым по курсору."""
+    comments = post.comments.select_related('author')
+    paginator = KeysetPaginator(comments, SHOW_COMMENTS, descending=False)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@tagged_condition(post_tags)
 def post_detail(request, post_id):
-    posts = get_object_or_404(Post, pk=post_id)
+    posts = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     form = CommentForm()
-    comments = Comment.objects.select_related('post').filter(post=posts)
     template = 'posts/post_detail.html'
     context = {
         'posts': posts,
+        'author_stats': stats_for(posts.author),
         'form': form,
-        'comments': comments,
+        'comments': comments_page(request, posts),
     }
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    """Фрагмент со следующей страницей комментариев для «Показать ещё»."""
+    post = get_object_or_404(Post, pk=post_id)
+    context = {
+        'posts': post,
+        'comments': comments_page(request, post),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -96,15 +157,20 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    user = request.user
-    authors = user.follower.values_list('author', flat=True)
-    posts_list = Post.objects.filter(author__id__in=authors)
-    page_obj = paginate_posts(request, posts_list)
+    # Всегда по курсору: каждый поток ленты читается одним проходом по
+    # индексу, без COUNT(*) и OFFSET.
+    page_obj = as_page(
+        KeysetPaginator(HomeTimeline(request.user), SHOW_POSTS).get_page(
+            request.GET.get('cursor')
+        ),
+        SHOW_POSTS,
+    )
     template = 'posts/follow.html'
     return render(request, template, {'page_obj': page_obj})
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     if request.method == 'POST':
         form = PostForm(request.POST, files=request.FILES or None)
@@ -121,6 +187,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
@@ -134,6 +201,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     username = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=username).delete()
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -93,11 +94,22 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Версии тегов core.cache должны быть общими для всех процессов: bump()
+# в одном воркере сбрасывает страницы, карточки и подписки во всех.
+# Кэш в памяти процесса годится только для runserver с DEBUG.
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': '127.0.0.1:11211',
+        }
     }
-}
 
 LANGUAGE_CODE = 'ru'
 
@@ -120,3 +132,44 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Ленты постов листаются по курсору (pub_date, id) вместо номера страницы.
+KEYSET_PAGINATION = False
+
+# Посты авторов, у которых подписчиков больше этого числа, не
+# раскладываются по лентам подписок, а подмешиваются при чтении.
+TIMELINE_FANOUT_LIMIT = 10000
+# Сколько последних постов автора подписка дописывает в ленту читателя.
+TIMELINE_BACKFILL = 200
+
+# Лимиты запросов к БД на один view: 'warn' пишет в лог, 'raise' — ошибка.
+QUERY_BUDGET_DEFAULT = 20
+QUERY_BUDGET_VIEWS = {}
+QUERY_REPEAT_LIMIT = 5
+QUERY_BUDGET_ACTION = 'warn'
+
+# Потоков для фоновой нарезки миниатюр; 0 — нарезать сразу, в том же потоке.
+THUMBNAIL_WORKERS = 2
+
+# Ширины копий картинок постов для srcset; каждая — в JPEG и WebP.
+IMAGE_VARIANT_WIDTHS = (320, 640, 960)
+
+# Загруженные картинки ужимаются до IMAGE_MAX_SIDE по большей стороне и
+# пересохраняются в JPEG; больше IMAGE_MAX_PIXELS не принимаются вовсе.
+# Не-JPEG декодируются целиком (RGBA — 4 байта на точку), поэтому для них
+# предел IMAGE_MAX_DECODED_PIXELS: около 48 МБ на загрузку.
+IMAGE_MAX_SIDE = 2560
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_DECODED_PIXELS = 12_000_000
+IMAGE_JPEG_QUALITY = 85
+# Загрузки больше мегабайта пишутся во временный файл, а не в память.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+
+# Файлы карты сайта собирает manage.py sitemap; адреса в них абсолютные.
+SITEMAP_ROOT = os.path.join(BASE_DIR, 'sitemaps')
+SITE_URL = 'http://localhost:8000'
+
+# Граф подписок для подсказок «Кого почитать» перечитывается из БД раз в
+# FOLLOW_GRAPH_TTL секунд, в фоновом потоке; False — сразу, в запросе.
+FOLLOW_GRAPH_TTL = 15 * 60
+FOLLOW_GRAPH_BACKGROUND = True
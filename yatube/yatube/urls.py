@@ -3,6 +3,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import media
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -13,7 +15,7 @@ urlpatterns = [
 ]
 if settings.DEBUG:
     urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+        settings.MEDIA_URL, view=media, document_root=settings.MEDIA_ROOT
     )
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'